@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+__title__ = "BatchBuild"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = """Builds variants of a design from a parameter table in worker processes and exports them.
+
+Usage with FreeCADCmd:
+    FreeCADCmd BatchBuild.py --pass table.csv [-o outdir] [-j workers] [-b Module.function] [-f step,brep,stl] [-t seconds]
+
+or from Python:
+    import BatchBuild
+    BatchBuild.runBatch("table.csv", "outdir", builder="FlyingWingS800.draw_S800")
+
+Each row of the table is one variant. The column "builder" selects the function that draws the variant,
+the column "name" names the output files, all other columns are passed as keyword arguments to the builder.
+A JSON table is a list of such rows, or an object {"builder": ..., "variants": [...]}.
+The builder returns a document, a document object or a Part.Shape. Of a document the shapes of all
+root objects are exported. Timing and volume of each variant are written to report.json and report.csv.
+A failing variant is recorded in the report and does not stop the others,
+also a variant whose worker crashes or does not finish within the timeout.
+Timeout and crash isolation need worker processes. In the FreeCAD GUI there are none unless the
+ParallelInGui parameter is set, then the variants are built one after the other in the GUI process.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import importlib
+import traceback
+import FreeCAD
+import Part
+import CurvedShapes
+
+formats = ["step", "brep", "stl"]
+
+# seconds a worker may take for one variant
+defaultTimeout = 1800
+reportColumns = ["name", "builder", "status", "buildTime", "exportTime", "volume", "area", "solids", "valid", "files", "error"]
+
+
+def parseValue(text):
+    """Converts a value of a CSV cell into int, float, bool or list (JSON syntax), otherwise returns the text"""
+    text = text.strip()
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    if text.startswith("["):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+    return text
+
+
+def readTable(path):
+    """Returns the list of variants in a CSV or JSON file. Each variant is a dict of parameters."""
+    if path.lower().endswith(".json"):
+        with open(path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            builder = data.get("builder")
+            variants = data.get("variants", [])
+            if builder:
+                variants = [dict({"builder": builder}, **v) for v in variants]
+            return variants
+        return data
+
+    with open(path, "r", newline="") as f:
+        return [{k.strip(): parseValue(v) for k, v in row.items() if k and v is not None and v.strip() != ""} for row in csv.DictReader(f)]
+
+
+def getBuilder(name):
+    """Returns the function for a name like 'FlyingWingS800.draw_S800'"""
+    module, func = name.rsplit(".", 1)
+    return getattr(importlib.import_module(module), func)
+
+
+def resultShapes(result):
+    """Returns the shapes to export from the return value of a builder"""
+    if isinstance(result, Part.Shape):
+        return [result]
+    if hasattr(result, "RootObjects"):
+        return [o.Shape for o in result.RootObjects if hasattr(o, "Shape") and not o.Shape.isNull()]
+    if hasattr(result, "Shape"):
+        return [result.Shape]
+    return []
+
+
+def exportShape(shape, path, fmt):
+    if fmt == "step":
+        shape.exportStep(path)
+    elif fmt == "brep":
+        shape.exportBrep(path)
+    elif fmt == "stl":
+        shape.exportStl(path)
+    else:
+        raise ValueError("Unknown export format %s" % fmt)
+
+
+def buildVariant(variant, outdir, exportFormats):
+    """Builds and exports one variant, returns its entry of the report. Runs in a worker process."""
+    params = dict(variant)
+    name = str(params.pop("name"))
+    builder = params.pop("builder")
+    entry = {"name": name, "builder": builder, "status": "ok", "files": []}
+
+    doc = None
+    try:
+        start = time.perf_counter()
+        result = getBuilder(builder)(**params)
+        shapes = resultShapes(result)
+        if not shapes:
+            raise RuntimeError("The builder returned no shapes")
+
+        compound = Part.makeCompound(shapes)
+        entry["buildTime"] = time.perf_counter() - start
+        entry["volume"] = sum(s.Volume for s in compound.Solids)
+        entry["area"] = compound.Area
+        entry["solids"] = len(compound.Solids)
+        entry["valid"] = compound.isValid()
+
+        start = time.perf_counter()
+        for fmt in exportFormats:
+            path = os.path.join(outdir, "%s.%s" % (name, fmt))
+            exportShape(compound, path, fmt)
+            entry["files"].append(path)
+        entry["exportTime"] = time.perf_counter() - start
+
+        if hasattr(result, "RootObjects"):
+            doc = result
+        elif hasattr(result, "Document"):
+            doc = result.Document
+    except Exception:
+        entry["status"] = "failed"
+        entry["error"] = traceback.format_exc()
+
+    # a worker builds many variants, do not keep their documents
+    if doc is not None:
+        FreeCAD.closeDocument(doc.Name)
+
+    return entry
+
+
+def failedEntry(variant, error):
+    return {"name": str(variant["name"]), "builder": variant["builder"], "status": "failed", "files": [], "error": error}
+
+
+def runVariants(variants, outdir, exportFormats, workers, timeout=defaultTimeout):
+    """
+    Builds the variants in a process pool and returns the report entries in the order of the variants.
+    If a worker crashes or a variant takes longer than timeout seconds, the unfinished variants are built again
+    one by one, so only the crashing or hanging variant fails.
+    Without worker processes the variants are built in this process, without timeout and crash isolation.
+    """
+    entries = [None] * len(variants)
+    pending = list(range(len(variants)))
+    isolate = False
+
+    while pending:
+        size = 1 if isolate else min(workers, len(pending))
+        pool = CurvedShapes.processPool(size)
+        if pool is None:
+            FreeCAD.Console.PrintWarning("No worker processes, the variants are built in this process without timeout\n")
+            for i in pending:
+                entries[i] = buildVariant(variants[i], outdir, exportFormats)
+                reportProgress(entries[i])
+            break
+
+        batch = pending[:1] if isolate else pending
+        error = runPool(pool, size, batch, variants, outdir, exportFormats, entries, timeout)
+        if error and isolate:
+            entries[batch[0]] = failedEntry(variants[batch[0]], error)
+            reportProgress(entries[batch[0]])
+
+        pending = [i for i in pending if entries[i] is None]
+        isolate = isolate or error is not None
+
+    return entries
+
+
+def runPool(pool, size, batch, variants, outdir, exportFormats, entries, timeout):
+    """
+    Builds the variants with the indices batch in pool and stores their report entries in entries.
+    Only size variants are submitted at once, so each one starts right away and gets timeout seconds from then.
+    Returns None, or the error if a worker crashed or a variant timed out. Then the pool is stopped
+    and the unfinished variants have no entry.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    queue = list(batch)
+    running = {}
+    while queue or running:
+        while queue and len(running) < size:
+            i = queue.pop(0)
+            running[pool.submit(buildVariant, variants[i], outdir, exportFormats)] = (i, time.monotonic() + timeout)
+
+        nextDeadline = min(deadline for i, deadline in running.values())
+        done, notDone = wait(running, timeout=max(0.0, nextDeadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        error = None
+        for future in done:
+            i, deadline = running.pop(future)
+            try:
+                entries[i] = future.result()
+                reportProgress(entries[i])
+            except BrokenProcessPool:
+                error = "The worker process crashed"
+
+        now = time.monotonic()
+        if error is None and any(deadline <= now for i, deadline in running.values()):
+            error = "The variant timed out after %g s" % timeout
+        if error:
+            CurvedShapes.stopPool(pool, list(running))
+            return error
+
+    pool.shutdown()
+    return None
+
+
+def reportProgress(entry):
+    if entry["status"] == "ok":
+        FreeCAD.Console.PrintMessage("%s: %.2f s, volume %.1f\n" % (entry["name"], entry["buildTime"], entry["volume"]))
+    else:
+        FreeCAD.Console.PrintError("%s failed\n" % entry["name"])
+
+
+def writeReport(entries, outdir, totalTime):
+    with open(os.path.join(outdir, "report.json"), "w") as f:
+        json.dump({"totalTime": totalTime, "variants": entries}, f, indent=2)
+
+    with open(os.path.join(outdir, "report.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=reportColumns)
+        writer.writeheader()
+        for entry in entries:
+            row = dict(entry)
+            row["files"] = " ".join(entry.get("files", []))
+            writer.writerow({k: row.get(k, "") for k in reportColumns})
+
+
+def runBatch(table, outdir, builder=None, exportFormats=formats, workers=None, timeout=defaultTimeout):
+    """
+    Builds all variants of table (a file name or a list of dicts) and exports them to outdir.
+    Returns the report entries.
+    """
+    variants = readTable(table) if isinstance(table, str) else list(table)
+    for n, variant in enumerate(variants):
+        variant.setdefault("name", "variant%03d" % n)
+        if builder:
+            variant.setdefault("builder", builder)
+        if not variant.get("builder"):
+            raise ValueError("No builder for variant %s" % variant["name"])
+
+    os.makedirs(outdir, exist_ok=True)
+    start = time.perf_counter()
+    entries = runVariants(variants, outdir, exportFormats, workers or os.cpu_count() or 1, timeout)
+    totalTime = time.perf_counter() - start
+    writeReport(entries, outdir, totalTime)
+
+    failed = sum(1 for e in entries if e["status"] != "ok")
+    FreeCAD.Console.PrintMessage("%d variants in %.2f s, %d failed\n" % (len(entries), totalTime, failed))
+    return entries
+
+
+def scriptArguments():
+    """FreeCADCmd passes the arguments after --pass to the script"""
+    if "--pass" in sys.argv:
+        return sys.argv[sys.argv.index("--pass") + 1:]
+    return sys.argv[1:]
+
+
+def main(args):
+    parser = argparse.ArgumentParser(prog="BatchBuild", description="Builds and exports variants of a design from a parameter table")
+    parser.add_argument("table", help="CSV or JSON file with one variant per row")
+    parser.add_argument("-o", "--outdir", default="batch", help="Directory for the exported files and the report")
+    parser.add_argument("-b", "--builder", help="Default builder function, e.g. FlyingWingS800.draw_S800")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("-f", "--formats", default=",".join(formats), help="Comma separated export formats: step, brep, stl")
+    parser.add_argument("-t", "--timeout", type=float, default=defaultTimeout, help="Seconds a variant may run, counted from its start, before its worker is stopped")
+    opts = parser.parse_args(args)
+
+    exportFormats = [f.strip().lower() for f in opts.formats.split(",") if f.strip()]
+    entries = runBatch(opts.table, opts.outdir, opts.builder, exportFormats, opts.workers, opts.timeout)
+    return 0 if all(e["status"] == "ok" for e in entries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(scriptArguments()))
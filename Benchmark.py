@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+__title__ = "Benchmark"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = """Benchmark of the Curved Shapes features to find performance regressions.
+
+Usage with FreeCADCmd:
+    FreeCADCmd Benchmark.py --pass [-o report.json] [-b baseline.json] [-t 0.25] [-r 3] [-k filter] [--quick] [--timeout 900]
+
+Builds the Horten H IX and the S800 examples at several sizes and numbers of items,
+and synthetic stress cases. Each case runs in its own process with the shape cache suspended.
+The wall time, the time of each phase (ribs, boundboxes, loft, solid, ...) per feature and the
+peak memory are written to a JSON report. If a baseline report is given, the exit code is 1
+if a case or a phase got slower than the baseline by more than the threshold.
+A case that does not finish within the timeout is stopped and counts as failed. If no worker
+process can be started, the cases run in this process and the report says "isolated": false.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import FreeCAD
+from FreeCAD import Vector
+import Part
+import CurvedShapes
+import ShapeCache
+import RecomputeStats
+import BatchBuild
+
+# name, builder, keyword arguments of the builder
+cases = [
+    ("HortenHIX", "Horten_HIX.draw_HortenHIX", {}),
+    ("HortenHIX-scale4", "Horten_HIX.draw_HortenHIX", {"scaleFactor": 4}),
+    ("HortenHIX-items2", "Horten_HIX.draw_HortenHIX", {"ItemsFactor": 2}),
+    ("HortenHIX-items4", "Horten_HIX.draw_HortenHIX", {"ItemsFactor": 4}),
+    ("S800", "FlyingWingS800.draw_S800", {}),
+    ("S800-scale2", "FlyingWingS800.draw_S800", {"wing_span": 1640, "sweep_offset": 420, "WingInside_length": 520, "WingOutside_length": 330}),
+    ("S800-items2", "FlyingWingS800.draw_S800", {"ItemsFactor": 2}),
+    ("S800-items4", "FlyingWingS800.draw_S800", {"ItemsFactor": 4}),
+    ("ManyEdgeProfile", "Benchmark.manyEdgeProfile", {"edges": 200}),
+    ("ManyHullcurves", "Benchmark.manyHullcurves", {"count": 24}),
+    ("LongPath", "Benchmark.longPath", {"items": 400}),
+    ("NotchGrid", "Benchmark.notchGrid", {"ribs": 40, "spars": 6}),
+]
+
+quickCases = ["HortenHIX", "S800", "ManyEdgeProfile", "ManyHullcurves", "LongPath", "NotchGrid"]
+
+# seconds a single run of a case may take
+defaultTimeout = 900
+
+
+def manyEdgeProfile(edges=200, items=16):
+    """CurvedSegment between two polygons with many edges"""
+    def polygon(radius, z):
+        return Part.makePolygon([Vector(radius * math.cos(2 * math.pi * i / edges), radius * math.sin(2 * math.pi * i / edges), z) for i in range(edges + 1)])
+
+    return CurvedShapes.buildCurvedSegment(polygon(50, 0), polygon(30, 200), Items=items, Surface=True, Solid=True)
+
+
+def manyHullcurves(count=24, items=32):
+    """CurvedArray of a circle inside many hullcurves around its axis"""
+    hullcurves = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        direction = Vector(math.cos(angle), math.sin(angle), 0)
+        points = [direction * (10 + 20 * math.sin(math.pi * z / 200)) + Vector(0, 0, z) for z in range(0, 201, 20)]
+        curve = Part.BSplineCurve()
+        curve.interpolate(points)
+        hullcurves.append(curve.toShape())
+
+    base = Part.Wire(Part.makeCircle(10))
+    return CurvedShapes.buildCurvedArray(base, hullcurves, Axis=Vector(0, 0, 1), Items=items, Surface=True, Solid=True)
+
+
+def longPath(items=400):
+    """CurvedPathArray of a circle along a long helix"""
+    base = Part.Wire(Part.makeCircle(5, Vector(50, 0, 0), Vector(0, 1, 0)))
+    path = Part.makeHelix(30, 1200, 50)
+    return CurvedShapes.buildCurvedPathArray(base, path, Items=items, Surface=True)
+
+
+def notchGrid(ribs=40, spars=6):
+    """NotchConnector of a grid of ribs and spars"""
+    ribShapes = [Part.makeBox(2, 40 * spars, 20, Vector(10 * i, 0, 0)) for i in range(ribs)]
+    sparShapes = [Part.makeBox(10 * ribs, 2, 20, Vector(-5, 40 * j + 20, 0)) for j in range(spars)]
+    return CurvedShapes.buildNotchConnector(Part.makeCompound(ribShapes), [Part.makeCompound(sparShapes)], CutDepth=50)
+
+
+def peakMemory():
+    """Returns the peak resident memory of this process in MB, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def runCase(builder, kwargs):
+    """Builds one case and returns its measurements. Runs in a worker process."""
+    ShapeCache.suspended = True
+    wasEnabled = RecomputeStats.enabled
+    RecomputeStats.enabled = True
+    RecomputeStats.collecting = True
+    RecomputeStats.reset()
+    entry = {"status": "ok"}
+    try:
+        start = time.perf_counter()
+        result = BatchBuild.getBuilder(builder)(**kwargs)
+        entry["wallTime"] = time.perf_counter() - start
+        if hasattr(result, "RootObjects"):
+            FreeCAD.closeDocument(result.Name)
+    except Exception as ex:
+        entry["status"] = "failed"
+        entry["error"] = repr(ex)
+
+    phases = {}
+    for stats in RecomputeStats.records:
+        for name, seconds in stats.phases.items():
+            phases[name] = phases.get(name, 0.0) + seconds
+    entry["phases"] = phases
+    entry["features"] = [stats.asDict() for stats in RecomputeStats.records]
+    # without a worker process the case runs in FreeCAD, which keeps running after it
+    RecomputeStats.collecting = False
+    RecomputeStats.enabled = wasEnabled
+    RecomputeStats.reset()
+    entry["peakMemory"] = peakMemory()
+    return entry
+
+
+def runIsolated(builder, kwargs, timeout=defaultTimeout):
+    """
+    Runs the case in a new process, so the memory and the caches of other cases do not interfere.
+    If no process can be started, the case runs in this process and its entry has "isolated": False.
+    """
+    from concurrent.futures import TimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+    pool = CurvedShapes.processPool(1)
+    if pool is None:
+        entry = runCase(builder, kwargs)
+        entry["isolated"] = False
+        return entry
+
+    try:
+        entry = CurvedShapes.poolMap(pool, runCase, [(builder, kwargs)], timeout)[0]
+    except BrokenProcessPool:
+        entry = {"status": "failed", "error": "The worker process crashed", "phases": {}, "features": []}
+    except TimeoutError:
+        entry = {"status": "failed", "error": "Timed out after %g s" % timeout, "phases": {}, "features": []}
+
+    entry["isolated"] = True
+    return entry
+
+
+def runBenchmark(names=None, repeat=3, timeout=defaultTimeout):
+    """Runs the cases and returns the report. Of repeated runs the fastest one is kept."""
+    report = {
+        "version": 1,
+        "freecad": ".".join(FreeCAD.Version()[:3]),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "isolated": True,
+        "cases": {},
+    }
+
+    for name, builder, kwargs in cases:
+        if names is not None and name not in names:
+            continue
+
+        best = None
+        for n in range(repeat):
+            entry = runIsolated(builder, kwargs, timeout)
+            if not entry["isolated"]:
+                report["isolated"] = False
+            if entry["status"] != "ok":
+                best = entry
+                break
+            if best is None or entry["wallTime"] < best["wallTime"]:
+                best = entry
+
+        report["cases"][name] = best
+        if best["status"] == "ok":
+            FreeCAD.Console.PrintMessage("%s: %.3f s, %s\n" % (name, best["wallTime"], ", ".join("%s %.3f s" % p for p in sorted(best["phases"].items()))))
+        else:
+            FreeCAD.Console.PrintError("%s failed: %s\n" % (name, best.get("error")))
+
+    if not report["isolated"]:
+        FreeCAD.Console.PrintWarning("No worker processes available, the cases ran in one process and share memory and caches\n")
+
+    return report
+
+
+def compare(report, baseline, threshold=0.25, minDelta=0.05):
+    """
+    Returns the regressions of report against baseline: cases and phases that are slower by more than
+    threshold (relative) and minDelta (seconds), and cases that failed.
+    """
+    regressions = []
+    for name, old in baseline.get("cases", {}).items():
+        new = report["cases"].get(name)
+        if new is None or old.get("status") != "ok":
+            continue
+        if new["status"] != "ok":
+            regressions.append("%s failed: %s" % (name, new.get("error")))
+            continue
+
+        timings = [("total", old["wallTime"], new["wallTime"])]
+        timings += [(phase, seconds, new["phases"].get(phase, 0.0)) for phase, seconds in old["phases"].items()]
+        for phase, before, after in timings:
+            if after > before * (1 + threshold) and after - before > minDelta:
+                regressions.append("%s %s: %.3f s -> %.3f s (%+.0f%%)" % (name, phase, before, after, (after / before - 1) * 100 if before > 0 else 100))
+
+    return regressions
+
+
+def main(args):
+    parser = argparse.ArgumentParser(prog="Benchmark", description="Benchmark of the Curved Shapes features")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="File for the JSON report")
+    parser.add_argument("-b", "--baseline", help="JSON report to compare with")
+    parser.add_argument("-t", "--threshold", type=float, default=0.25, help="Allowed slowdown against the baseline, 0.25 = 25%%")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per case, the fastest counts")
+    parser.add_argument("-k", "--cases", help="Comma separated names of the cases to run")
+    parser.add_argument("--quick", action="store_true", help="Run only one case per example and the synthetic cases")
+    parser.add_argument("--timeout", type=float, default=defaultTimeout, help="Seconds a run of a case may take before it is stopped")
+    opts = parser.parse_args(args)
+
+    names = None
+    if opts.cases:
+        names = [n.strip() for n in opts.cases.split(",")]
+    elif opts.quick:
+        names = quickCases
+
+    report = runBenchmark(names, max(1, opts.repeat), opts.timeout)
+    with open(opts.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if not opts.baseline:
+        return 0
+
+    with open(opts.baseline, "r") as f:
+        baseline = json.load(f)
+
+    if baseline.get("isolated", True) != report["isolated"]:
+        FreeCAD.Console.PrintWarning("Only one of the report and the baseline ran its cases in separate processes, the times may not be comparable\n")
+
+    regressions = compare(report, baseline, opts.threshold)
+    for r in regressions:
+        FreeCAD.Console.PrintError("Regression: %s\n" % r)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(BatchBuild.scriptArguments()))
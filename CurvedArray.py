@@ -12,6 +12,9 @@ from FreeCAD import Vector
 import Part
 import CompoundTools.Explode
 import CurvedShapes
+import ShapeCache
+import RecomputeStats
+import numpy as np
 if FreeCAD.GuiUp:
     import FreeCADGui
 
@@ -37,7 +40,10 @@ class CurvedArray:
                  Twists = [],
                  LoftMaxDegree=5,
                  MaxLoftSize=16,
-                 KeepBase='None'):
+                 KeepBase='None',
+                 SurfaceMode='Loft',
+                 ParallelLoft=False,
+                 AdaptiveTolerance=0.0):
         CurvedShapes.addObjectProperty(obj, "App::PropertyLink", "Base", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "The object to make an array from")).Base = base
         CurvedShapes.addObjectProperty(obj, "App::PropertyLinkList", "Hullcurves", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Bounding curves")).Hullcurves = hullcurves
         CurvedShapes.addObjectProperty(obj, "App::PropertyVector", "Axis", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Direction axis")).Axis = axis
@@ -54,23 +60,43 @@ class CurvedArray:
         CurvedShapes.addObjectProperty(obj, "App::PropertyBool", "DistributionReverse", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Reverses direction of Distribution algorithm")).DistributionReverse = DistributionReverse
         CurvedShapes.addObjectProperty(obj, "App::PropertyInteger", "LoftMaxDegree", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Max Degree for Surface or Solid")).LoftMaxDegree = LoftMaxDegree
         CurvedShapes.addObjectProperty(obj, "App::PropertyInteger", "MaxLoftSize", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Max Size of a Loft in Segments.")).MaxLoftSize = MaxLoftSize
+        CurvedShapes.addObjectProperty(obj, "App::PropertyEnumeration", "SurfaceMode", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting"))
+        CurvedShapes.addObjectProperty(obj, "App::PropertyBool", "ParallelLoft", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes")).ParallelLoft = ParallelLoft
+        CurvedShapes.addObjectProperty(obj, "App::PropertyFloat", "AdaptiveTolerance", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "If > 0, generate the Positions so that the ribs follow the hullcurves within this tolerance")).AdaptiveTolerance = AdaptiveTolerance
         obj.Distribution = ['linear', 'parabolic', 'x³', 'sinusoidal', 'asinusoidal', 'elliptic']
         obj.Distribution = Distribution
         obj.KeepBase = ['None', 'First', 'Last']
         obj.KeepBase = KeepBase
+        obj.SurfaceMode = ['Loft', 'Direct']
+        obj.SurfaceMode = SurfaceMode
         self.extract = extract
         self.doScaleXYZ = []
         self.doScaleXYZsum = [False, False, False]
         obj.Proxy = self
 
 
-    def makeRibs(self, obj):
+    def makeRibs(self, obj, stationBoxes={}):
         pl = obj.Placement
-        ribs = []
+        ribKey = ShapeCache.featureKey(obj, ShapeCache.surfaceProperties, memoryOnly=True)
+        ribs = ShapeCache.lookupShapes(ribKey)
+        if ribs is None:
+            ribs = self.buildRibs(obj, stationBoxes)
+            ShapeCache.storeShapes(ribKey, ribs)
+
+        if (obj.Surface or obj.Solid) and obj.Items > 1:
+            obj.Shape = CurvedShapes.makeSurfaceSolid(ribs, obj.Solid, maxDegree=obj.LoftMaxDegree, maxLoftSize=obj.MaxLoftSize, surfaceMode=obj.SurfaceMode, parallel=obj.ParallelLoft, cacheKey=ribKey)
+        else:
+            obj.Shape = Part.makeCompound(ribs)
+
+        obj.Placement = pl
+
+
+    def arrayRange(self, obj):
+        """Returns the position of the first rib and the vector to the last rib"""
         curvebox = FreeCAD.BoundBox(float("-inf"), float("-inf"), float("-inf"), float("inf"), float("inf"), float("inf"))
 
         for n in range(0, len(obj.Hullcurves)):
-            cbbx = obj.Hullcurves[n].Shape.BoundBox
+            cbbx = obj.Hullcurves[n].BoundBox
             if self.doScaleXYZ[n][0]:
                 if cbbx.XMin > curvebox.XMin: curvebox.XMin = cbbx.XMin
                 if cbbx.XMax < curvebox.XMax: curvebox.XMax = cbbx.XMax
@@ -81,28 +107,53 @@ class CurvedArray:
                 if cbbx.ZMin > curvebox.ZMin: curvebox.ZMin = cbbx.ZMin
                 if cbbx.ZMax < curvebox.ZMax: curvebox.ZMax = cbbx.ZMax
 
+        hullbox = obj.Hullcurves[0].BoundBox
         if curvebox.XMin == float("-inf"): 
-            curvebox.XMin = obj.Hullcurves[0].Shape.BoundBox.XMin
+            curvebox.XMin = hullbox.XMin
         if curvebox.XMax == float("inf"): 
-            curvebox.XMax = obj.Hullcurves[0].Shape.BoundBox.XMax
+            curvebox.XMax = hullbox.XMax
         if curvebox.YMin == float("-inf"): 
-            curvebox.YMin = obj.Hullcurves[0].Shape.BoundBox.YMin
+            curvebox.YMin = hullbox.YMin
         if curvebox.YMax == float("inf"): 
-            curvebox.YMax = obj.Hullcurves[0].Shape.BoundBox.YMax
+            curvebox.YMax = hullbox.YMax
         if curvebox.ZMin == float("-inf"): 
-            curvebox.ZMin = obj.Hullcurves[0].Shape.BoundBox.ZMin
+            curvebox.ZMin = hullbox.ZMin
         if curvebox.ZMax == float("inf"): 
-            curvebox.ZMax = obj.Hullcurves[0].Shape.BoundBox.ZMax
+            curvebox.ZMax = hullbox.ZMax
 
         areavec = Vector(curvebox.XLength, curvebox.YLength, curvebox.ZLength)
         deltavec = areavec.scale(obj.Axis.x, obj.Axis.y ,obj.Axis.z) - (obj.OffsetStart + obj.OffsetEnd) * obj.Axis
-        sections = int(obj.Items)
         startvec = Vector(curvebox.XMin, curvebox.YMin, curvebox.ZMin)
         if obj.Axis.x < 0: startvec.x = curvebox.XMax
         if obj.Axis.y < 0: startvec.y = curvebox.YMax
         if obj.Axis.z < 0: startvec.z = curvebox.ZMax
         pos0 = startvec + (obj.OffsetStart * obj.Axis)
+        return pos0, deltavec
+
+
+    def adaptivePositions(self, obj):
+        """
+        Returns Positions where the rib bounds deviate at most AdaptiveTolerance from a linear interpolation,
+        and the rib bounds of all evaluated positions, so buildRibs does not intersect the hullcurves again
+        """
+        pos0, deltavec = self.arrayRange(obj)
+        stationBoxes = {}
+
+        def evaluate(positions):
+            posvecs = [pos0 + (deltavec * p) for p in positions]
+            bboxes = CurvedShapes.boundboxes_from_intersect(obj.Hullcurves, posvecs, [obj.Axis] * len(posvecs), self.doScaleXYZ, False)
+            stationBoxes.update(zip(positions, bboxes))
+            return [np.array([b.XMin, b.XMax, b.YMin, b.YMax, b.ZMin, b.ZMax]) if b else None for b in bboxes]
+
+        return CurvedShapes.adaptiveStations(evaluate, obj.AdaptiveTolerance), stationBoxes
 
+
+    @RecomputeStats.timedPhase("ribs")
+    def buildRibs(self, obj, stationBoxes={}):
+        ribs = []
+        pos0, deltavec = self.arrayRange(obj)
+        sections = int(obj.Items)
+        stations = []
         if (not hasattr(obj,"Positions") or len(obj.Positions) == 0):
             for x in range(0, sections):
                 if sections > 1:
@@ -110,36 +161,37 @@ class CurvedArray:
 
                     posvec = pos0 + (deltavec * d)
                 else:
+                    d = 0
                     posvec = pos0
 
-                rib = self.makeRibRotate(obj, posvec, x, d, ribs)
+                stations.append((posvec, x, d))
         else:
             x = 0
             for p in obj.Positions:
                 posvec = pos0 + (deltavec * p) 
 
-                rib = self.makeRibRotate(obj, posvec, x, x / len(obj.Positions), ribs)
+                stations.append((posvec, x, x / len(obj.Positions)))
                 x = x + 1
 
+        if len(obj.Positions) > 0 and all(p in stationBoxes for p in obj.Positions):
+            bboxes = [stationBoxes[p] for p in obj.Positions]
+        else:
+            positions = [st[0] for st in stations]
+            bboxes = CurvedShapes.boundboxes_from_intersect(obj.Hullcurves, positions, [obj.Axis] * len(positions), self.doScaleXYZ, False)
+        for n in range(0, len(stations)):
+            posvec, x, d = stations[n]
+            self.makeRibRotate(obj, bboxes[n], x, d, ribs)
+
         if (obj.KeepBase == 'First'):
             ribs[0] = obj.Base.Shape.copy()
         elif (obj.KeepBase == 'Last'):
             ribs[-1] = obj.Base.Shape.copy()
-        
-        if (obj.Surface or obj.Solid) and obj.Items > 1:
-            obj.Shape = CurvedShapes.makeSurfaceSolid(ribs, obj.Solid, maxDegree=obj.LoftMaxDegree, maxLoftSize=obj.MaxLoftSize)
-        else:
-            obj.Shape = Part.makeCompound(ribs)
-
-        obj.Placement = pl
 
-        if self.extract:
-            CompoundTools.Explode.explodeCompound(obj)
-            obj.ViewObject.hide()
+        return ribs
 
 
-    def makeRibRotate(self, obj, posvec, x, d, ribs):
-        dolly = self.makeRib(obj, posvec)
+    def makeRibRotate(self, obj, bbox, x, d, ribs):
+        dolly = self.makeRib(obj, bbox)
         if dolly:
             if x < len(obj.Twists):
                 dolly = dolly.rotate(dolly.BoundBox.Center, obj.Axis, obj.Twists[x])
@@ -149,8 +201,7 @@ class CurvedArray:
             ribs.append(dolly)
 
 
-    def makeRib(self, obj, posvec):
-        bbox = CurvedShapes.boundbox_from_intersect(obj.Hullcurves, posvec, obj.Axis, self.doScaleXYZ, False)
+    def makeRib(self, obj, bbox):
         if not bbox:
             return None
 
@@ -163,18 +214,20 @@ class CurvedArray:
         return CurvedShapes.scaleByBoundbox(obj.Base.Shape, bbox, self.doScaleXYZsum, copy=True)
 
 
-    def execute(self, prop):
-        if prop.Base and prop.Axis == Vector(0.0,0.0,0.0):
-            prop.Axis = CurvedShapes.getNormal(prop.Base)
+    @RecomputeStats.timedExecute
+    def execute(self, fp):
+        if fp.Base and fp.Axis == Vector(0.0,0.0,0.0):
+            fp.Axis = CurvedShapes.getNormal(fp.Base)
             return
 
+        prop = CurvedShapes.FeatureSnapshot(fp, ["Base", "Hullcurves"])
         self.doScaleXYZ = []
         self.doScaleXYZsum = [False, False, False]
         sumbbox=None   #Define the variable other wise it causes error 
         for h in prop.Hullcurves:
-            bbox = h.Shape.BoundBox
+            bbox = h.BoundBox
             if h == prop.Hullcurves[0]:
-                sumbbox = bbox
+                sumbbox = FreeCAD.BoundBox(bbox)
             else:
                 sumbbox.add(bbox)
 
@@ -201,11 +254,36 @@ class CurvedArray:
             if sumbbox.ZLength > epsilon: 
                 self.doScaleXYZsum[2] = True
 
-        if (hasattr(prop,"Positions") and len(prop.Positions) != 0) or (prop.Items and prop.Base and hasattr(prop.Base, "Shape") and len(prop.Hullcurves) > 0):
-            self.makeRibs(prop)
+        adaptive = prop.AdaptiveTolerance > 0 and prop.Base and len(prop.Hullcurves) > 0
+        if adaptive or (hasattr(prop,"Positions") and len(prop.Positions) != 0) or (prop.Items and prop.Base and hasattr(prop.Base, "Shape") and len(prop.Hullcurves) > 0):
+            key = ShapeCache.featureKey(prop, ShapeCache.adaptiveProperties if adaptive else [])
+            shape = ShapeCache.lookup(key)
+            if shape is not None:
+                pl = fp.Placement
+                fp.Shape = shape
+                fp.Placement = pl
+            else:
+                stationBoxes = {}
+                if adaptive:
+                    positions, stationBoxes = self.adaptivePositions(prop)
+                    if list(fp.Positions) != positions:
+                        fp.Positions = positions
+
+                self.makeRibs(prop, stationBoxes)
+                ShapeCache.store(key, fp.Shape)
+
+            if self.extract:
+                CompoundTools.Explode.explodeCompound(fp)
+                if fp.ViewObject:
+                    fp.ViewObject.hide()
             return
 
 
+    def onBeforeChange(self, fp, prop):
+        if prop == "AdaptiveTolerance":
+            self.adaptiveBefore = getattr(fp, "AdaptiveTolerance", None) or 0.0
+
+
     def onChanged(self, fp, prop):
         if not hasattr(fp, 'LoftMaxDegree'):
             CurvedShapes.addObjectProperty(fp, "App::PropertyInteger", "LoftMaxDegree", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Max Degree for Surface or Solid"), init_val=5) # backwards compatibility - this upgrades older documents
@@ -215,7 +293,19 @@ class CurvedArray:
             CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "KeepBase", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Include the base shape unmodified and where"))
             fp.KeepBase = ['None', 'First', 'Last']
             fp.KeepBase = 'None'
+        if not hasattr(fp, 'SurfaceMode'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "SurfaceMode", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting")) # backwards compatibility - this upgrades older documents
+            fp.SurfaceMode = ['Loft', 'Direct']
+            fp.SurfaceMode = 'Loft'
+        if not hasattr(fp, 'ParallelLoft'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyBool", "ParallelLoft", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes"), init_val=False) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'AdaptiveTolerance'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyFloat", "AdaptiveTolerance", "CurvedArray", QT_TRANSLATE_NOOP("App::Property", "If > 0, generate the Positions so that the ribs follow the hullcurves within this tolerance"), init_val=0.0) # backwards compatibility - this upgrades older documents
            
+        # the generated Positions must not override Items after the adaptive mode is switched off
+        if prop == "AdaptiveTolerance" and fp.AdaptiveTolerance <= 0 and getattr(self, "adaptiveBefore", 0.0) > 0:
+            fp.Positions = []
+
         if "Positions" in prop and len(fp.Positions) != 0:
             setattr(fp,"Items",str(len(fp.Positions)))
             outOfBounds = False
@@ -310,4 +400,5 @@ if FreeCAD.GuiUp:
                     'ToolTip' : __doc__}
 
 
-    FreeCADGui.addCommand('CurvedArray', CurvedArrayCommand())
+    if 'CurvedArray' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('CurvedArray', CurvedArrayCommand())
@@ -12,6 +12,8 @@ from FreeCAD import Vector
 import Part
 import CompoundTools.Explode
 import CurvedShapes
+import ShapeCache
+import RecomputeStats
 import math
 if FreeCAD.GuiUp:
     import FreeCADGui
@@ -34,7 +36,10 @@ class CurvedPathArray:
                  doScale = [],
                  extract=False,
                  LoftMaxDegree=5,
-                 MaxLoftSize=16):
+                 MaxLoftSize=16,
+                 SurfaceMode='Loft',
+                 ParallelLoft=False,
+                 FrameMode='Tangent'):
         CurvedShapes.addObjectProperty(obj,"App::PropertyLink", "Base", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "The object to make an array from")).Base = base
         CurvedShapes.addObjectProperty(obj,"App::PropertyLink", "Path", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Sweep path")).Path = path
         CurvedShapes.addObjectProperty(obj,"App::PropertyLinkList", "Hullcurves", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Bounding curves")).Hullcurves = hullcurves   
@@ -49,6 +54,13 @@ class CurvedPathArray:
         CurvedShapes.addObjectProperty(obj,"App::PropertyBool", "ScaleZ", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Scale by hullcurves in Z direction")).ScaleZ = True
         CurvedShapes.addObjectProperty(obj,"App::PropertyInteger", "LoftMaxDegree", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Max Degree for Surface or Solid")).LoftMaxDegree = LoftMaxDegree
         CurvedShapes.addObjectProperty(obj,"App::PropertyInteger", "MaxLoftSize", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Max Size of a Loft in Segments.")).MaxLoftSize = MaxLoftSize
+        CurvedShapes.addObjectProperty(obj,"App::PropertyEnumeration", "SurfaceMode", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting"))
+        CurvedShapes.addObjectProperty(obj,"App::PropertyBool", "ParallelLoft", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes")).ParallelLoft = ParallelLoft
+        CurvedShapes.addObjectProperty(obj,"App::PropertyEnumeration", "FrameMode", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Tangent: turn each item onto the path tangent. RotationMinimizing: keep the roll of the first item along the path"))
+        obj.SurfaceMode = ['Loft', 'Direct']
+        obj.SurfaceMode = SurfaceMode
+        obj.FrameMode = ['Tangent', 'RotationMinimizing']
+        obj.FrameMode = FrameMode
         self.doScaleXYZsum = [False, False, False]
         if len(doScale) == 3:
             obj.ScaleX = doScale[0]
@@ -62,11 +74,27 @@ class CurvedPathArray:
 
     def makeRibs(self, obj):
         pl = obj.Placement
+        ribKey = ShapeCache.featureKey(obj, ShapeCache.surfaceProperties, memoryOnly=True)
+        ribs = ShapeCache.lookupShapes(ribKey)
+        if ribs is None:
+            ribs = self.buildRibs(obj)
+            ShapeCache.storeShapes(ribKey, ribs)
+
+        if (obj.Surface or obj.Solid) and obj.Items > 1:
+            obj.Shape = CurvedShapes.makeSurfaceSolid(ribs, obj.Solid, maxDegree=obj.LoftMaxDegree, maxLoftSize=obj.MaxLoftSize, surfaceMode=obj.SurfaceMode, parallel=obj.ParallelLoft, cacheKey=ribKey)
+        else:
+            obj.Shape = Part.makeCompound(ribs)
+
+        obj.Placement = pl
+
+
+    @RecomputeStats.timedPhase("ribs")
+    def buildRibs(self, obj):
         ribs = []
         curvebox = FreeCAD.BoundBox(float("-inf"), float("-inf"), float("-inf"), float("inf"), float("inf"), float("inf"))
 
         for n in range(0, len(obj.Hullcurves)):
-            cbbx = obj.Hullcurves[n].Shape.BoundBox
+            cbbx = obj.Hullcurves[n].BoundBox
             if self.doScaleXYZ[n][0]:
                 if cbbx.XMin > curvebox.XMin: curvebox.XMin = cbbx.XMin
                 if cbbx.XMax < curvebox.XMax: curvebox.XMax = cbbx.XMax
@@ -78,83 +106,70 @@ class CurvedPathArray:
                 if cbbx.ZMax < curvebox.ZMax: curvebox.ZMax = cbbx.ZMax
 
         if len(obj.Hullcurves) > 0: 
+            hullbox = obj.Hullcurves[0].BoundBox
             if curvebox.XMin == float("-inf"): 
-                curvebox.XMin = obj.Hullcurves[0].Shape.BoundBox.XMin
+                curvebox.XMin = hullbox.XMin
             if curvebox.XMax == float("inf"): 
-                curvebox.XMax = obj.Hullcurves[0].Shape.BoundBox.XMax
+                curvebox.XMax = hullbox.XMax
             if curvebox.YMin == float("-inf"): 
-                curvebox.YMin = obj.Hullcurves[0].Shape.BoundBox.YMin
+                curvebox.YMin = hullbox.YMin
             if curvebox.YMax == float("inf"): 
-                curvebox.YMax = obj.Hullcurves[0].Shape.BoundBox.YMax
+                curvebox.YMax = hullbox.YMax
             if curvebox.ZMin == float("-inf"): 
-                curvebox.ZMin = obj.Hullcurves[0].Shape.BoundBox.ZMin
+                curvebox.ZMin = hullbox.ZMin
             if curvebox.ZMax == float("inf"): 
-                curvebox.ZMax = obj.Hullcurves[0].Shape.BoundBox.ZMax
-
-        maxlen = 0   
-        edgelen = []
-        edges = Part.__sortEdges__(obj.Path.Shape.Edges)
-        for edge in edges:
-            maxlen += edge.Length
-            edgelen.append(edge.Length)
+                curvebox.ZMax = hullbox.ZMax
 
+        sampler = CurvedShapes.pathSampler(obj.Path)
+        normal = CurvedShapes.getNormal(obj.Base)
+        lengths = []
         for n in range(0, int(obj.Items)):
             plen = obj.OffsetStart
             if obj.Items > 1:
-                plen += (maxlen - obj.OffsetStart - obj.OffsetEnd) * n / (float(obj.Items) - 1)
-
-            for edge in edges:
-                if plen > edge.Length: 
-                    plen -= edge.Length
-                else:
-                    param = edge.getParameterByLength(plen)
-                    direction = edge.tangentAt(param) 
-                    posvec = edge.valueAt(param) 
-                    normal = CurvedShapes.getNormal(obj.Base)
-                    rotaxis = normal.cross(direction)
-                    angle = math.degrees(normal.getAngle(direction))
-
-                    #dolly = self.makeRib(obj, posvec, direction)
-                    dolly = obj.Base.Shape.copy()
-                    if rotaxis.Length > epsilon:
-                        dolly = dolly.rotate(dolly.BoundBox.Center, rotaxis, angle)
-
-                    dolly.Placement.Base = posvec
-                    if dolly: 
-                        if not obj.Twist == 0 and n > 0:
-                            dolly = dolly.rotate(posvec, direction, obj.Twist * n / int(obj.Items))
-
-                        if len(obj.Hullcurves) > 0:
-                            if not obj.ScaleX: direction = Vector(1, 0, 0)
-                            if not obj.ScaleY: direction = Vector(0, 1, 0)
-                            if not obj.ScaleZ: direction = Vector(0, 0, 1)
-
-                            bbox = CurvedShapes.boundbox_from_intersect(obj.Hullcurves, posvec, direction, self.doScaleXYZ)
-                            if bbox:
-                                dolly = CurvedShapes.scaleByBoundbox(dolly, bbox, self.doScaleXYZsum, copy=True)
-
-                        ribs.append(dolly) 
-
-                    break
-
-        if (obj.Surface or obj.Solid) and obj.Items > 1:
-            obj.Shape = CurvedShapes.makeSurfaceSolid(ribs, obj.Solid, maxDegree=obj.LoftMaxDegree, maxLoftSize=obj.MaxLoftSize)
-        else:
-            obj.Shape = Part.makeCompound(ribs)
-
-        obj.Placement = pl
-
-        if self.extract:
-            CompoundTools.Explode.explodeCompound(obj)
-            obj.ViewObject.hide()
-
-
-    def execute(self, prop):
+                plen += (sampler.Length - obj.OffsetStart - obj.OffsetEnd) * n / (float(obj.Items) - 1)
+            lengths.append(plen)
+
+        points, tangents = sampler.sample(lengths)
+        stations = [n for n in range(0, len(lengths)) if points[n] is not None]
+        rotations = CurvedShapes.pathRotations([normal] * len(stations), [points[n] for n in stations], [tangents[n] for n in stations], obj.FrameMode)
+        baserot = obj.Base.Shape.Placement.Rotation
+        positions = []
+        directions = []
+        for n, rota in zip(stations, rotations):
+            posvec = points[n]
+            direction = tangents[n]
+            if not obj.Twist == 0 and n > 0:
+                rota = FreeCAD.Rotation(direction, obj.Twist * n / int(obj.Items)).multiply(rota)
+
+            # one placement instead of rotating onto the path and rotating by Twist
+            # the items share the geometry of Base, scaling by the hullcurves makes copies
+            dolly = CurvedShapes.locatedShape(obj.Base.Shape, FreeCAD.Placement(posvec, rota.multiply(baserot)))
+
+            if not obj.ScaleX: direction = Vector(1, 0, 0)
+            if not obj.ScaleY: direction = Vector(0, 1, 0)
+            if not obj.ScaleZ: direction = Vector(0, 0, 1)
+
+            ribs.append(dolly) 
+            positions.append(posvec)
+            directions.append(direction)
+
+        if len(obj.Hullcurves) > 0:
+            bboxes = CurvedShapes.boundboxes_from_intersect(obj.Hullcurves, positions, directions, self.doScaleXYZ)
+            for n in range(0, len(ribs)):
+                if bboxes[n]:
+                    ribs[n] = CurvedShapes.scaleByBoundbox(ribs[n], bboxes[n], self.doScaleXYZsum, copy=True)
+
+        return ribs
+
+
+    @RecomputeStats.timedExecute
+    def execute(self, fp):
+        prop = CurvedShapes.FeatureSnapshot(fp, ["Base", "Path", "Hullcurves"])
         self.doScaleXYZ = []
         self.doScaleXYZsum = [False, False, False]
         bbox = None
         for h in prop.Hullcurves:
-            bbox = h.Shape.BoundBox
+            bbox = FreeCAD.BoundBox(h.BoundBox)
             doScale = [False, False, False]
 
             if bbox.XLength > epsilon: 
@@ -170,7 +185,7 @@ class CurvedPathArray:
 
         if bbox:
             for h in prop.Hullcurves:
-                bbox.add(h.Shape.BoundBox)
+                bbox.add(h.BoundBox)
 
             if bbox.XLength > epsilon: 
                 self.doScaleXYZsum[0] = prop.ScaleX
@@ -181,8 +196,21 @@ class CurvedPathArray:
             if bbox.ZLength > epsilon: 
                 self.doScaleXYZsum[2] = prop.ScaleZ
 
-        if prop.Items > 0 and prop.Base and hasattr(prop.Base, "Shape") and prop.Path and hasattr(prop.Path, "Shape") and len(prop.Path.Shape.Edges) > 0:
-            self.makeRibs(prop)
+        if prop.Items > 0 and prop.Base and hasattr(prop.Base, "Shape") and prop.Path and hasattr(prop.Path, "Shape") and len(prop.Path.Edges) > 0:
+            key = ShapeCache.featureKey(prop)
+            shape = ShapeCache.lookup(key)
+            if shape is not None:
+                pl = fp.Placement
+                fp.Shape = shape
+                fp.Placement = pl
+            else:
+                self.makeRibs(prop)
+                ShapeCache.store(key, fp.Shape)
+
+            if self.extract:
+                CompoundTools.Explode.explodeCompound(fp)
+                if fp.ViewObject:
+                    fp.ViewObject.hide()
             return
 
 
@@ -191,6 +219,16 @@ class CurvedPathArray:
             CurvedShapes.addObjectProperty(fp, "App::PropertyInteger", "LoftMaxDegree", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Max Degree for Surface or Solid"), init_val=5) # backwards compatibility - this upgrades older documents
         if not hasattr(fp, 'MaxLoftSize'):
             CurvedShapes.addObjectProperty(fp, "App::PropertyInteger", "MaxLoftSize", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Max Size of a Loft in Segments."), init_val=-1) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'SurfaceMode'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "SurfaceMode", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting")) # backwards compatibility - this upgrades older documents
+            fp.SurfaceMode = ['Loft', 'Direct']
+            fp.SurfaceMode = 'Loft'
+        if not hasattr(fp, 'ParallelLoft'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyBool", "ParallelLoft", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes"), init_val=False) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'FrameMode'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "FrameMode", "CurvedPathArray", QT_TRANSLATE_NOOP("App::Property", "Tangent: turn each item onto the path tangent. RotationMinimizing: keep the roll of the first item along the path")) # backwards compatibility - this upgrades older documents
+            fp.FrameMode = ['Tangent', 'RotationMinimizing']
+            fp.FrameMode = 'Tangent'
 
 
 #background compatibility
@@ -279,4 +317,5 @@ if FreeCAD.GuiUp:
                     'ToolTip' : __doc__}
 
 
-    FreeCADGui.addCommand('CurvedPathArray', CurvedPathArrayCommand())
+    if 'CurvedPathArray' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('CurvedPathArray', CurvedPathArrayCommand())
@@ -11,7 +11,11 @@ import FreeCAD
 from FreeCAD import Vector
 import Part
 import CurvedShapes
+import ShapeCache
+import RecomputeStats
 import math
+import numpy as np
+from collections import OrderedDict
 if FreeCAD.GuiUp:
     import FreeCADGui
 
@@ -37,7 +41,12 @@ class CurvedSegment:
                  LoftMaxDegree=5,
                  MaxLoftSize=16,
                  Path=None,
-                 ForceInterpolated = False):
+                 ForceInterpolated = False,
+                 SurfaceMode='Loft',
+                 ParallelLoft=False,
+                 FrameMode='Tangent',
+                 Positions=[],
+                 AdaptiveTolerance=0.0):
         CurvedShapes.addObjectProperty(fp,"App::PropertyLink", "Shape1", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "The first object of the segment")).Shape1 = shape1
         CurvedShapes.addObjectProperty(fp,"App::PropertyLink", "Shape2", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "The last object of the segment")).Shape2 = shape2
         CurvedShapes.addObjectProperty(fp,"App::PropertyLinkList", "Hullcurves", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Bounding curves")).Hullcurves = hullcurves        
@@ -55,27 +64,41 @@ class CurvedSegment:
         CurvedShapes.addObjectProperty(fp,"App::PropertyInteger", "MaxLoftSize", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Max Size of a Loft in Segments.")).MaxLoftSize = MaxLoftSize
         CurvedShapes.addObjectProperty(fp,"App::PropertyLink", "Path", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Sweep path")).Path = Path
         CurvedShapes.addObjectProperty(fp,"App::PropertyBool", "ForceInterpolated", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Force Interpolation of sketches")).ForceInterpolated = ForceInterpolated
+        CurvedShapes.addObjectProperty(fp,"App::PropertyEnumeration", "SurfaceMode", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting"))
+        CurvedShapes.addObjectProperty(fp,"App::PropertyBool", "ParallelLoft", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes")).ParallelLoft = ParallelLoft
         fp.Distribution = ['linear', 'parabolic', 'x³', 'sinusoidal', 'asinusoidal', 'elliptic']
         fp.Distribution = Distribution
+        CurvedShapes.addObjectProperty(fp,"App::PropertyFloatList", "Positions", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Positions for items between the segments (as floats from 0.0 to 1.0) -- overrides Items and Distribution")).Positions = Positions
+        CurvedShapes.addObjectProperty(fp,"App::PropertyFloat", "AdaptiveTolerance", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "If > 0, generate the Positions so that the items follow the shapes and hullcurves within this tolerance")).AdaptiveTolerance = AdaptiveTolerance
+        CurvedShapes.addObjectProperty(fp,"App::PropertyEnumeration", "FrameMode", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Tangent: turn each item onto the Path tangent. RotationMinimizing: keep the roll of the first item along the Path"))
+        fp.SurfaceMode = ['Loft', 'Direct']
+        fp.SurfaceMode = SurfaceMode
+        fp.FrameMode = ['Tangent', 'RotationMinimizing']
+        fp.FrameMode = FrameMode
         self.doScaleXYZ = []
         self.doScaleXYZsum = [False, False, False]
         self.update = True
         fp.Proxy = self
 
 
+    @RecomputeStats.timedExecute
     def execute(self, fp):
         if not self.update:
             return 
 
-        if not fp.Shape1 or not hasattr(fp.Shape1, "Shape") or len(fp.Shape1.Shape.Edges) == 0:
+        if not fp.Shape1 or not hasattr(fp.Shape1, "Shape"):
             return
 
-        if not fp.Shape2 or not hasattr(fp.Shape2, "Shape") or len(fp.Shape2.Shape.Edges) == 0:
+        if not fp.Shape2 or not hasattr(fp.Shape2, "Shape"):
             return
 
         if fp.InterpolationPoints <= 1:
             return
 
+        fp = CurvedShapes.FeatureSnapshot(fp, ["Shape1", "Shape2", "Path", "Hullcurves"])
+        if len(fp.Shape1.Edges) == 0 or len(fp.Shape2.Edges) == 0:
+            return
+
         try:
             self.update = False
             if fp.NormalShape1 == Vector(0,0,0):
@@ -87,7 +110,7 @@ class CurvedSegment:
             self.doScaleXYZ = []
             self.doScaleXYZsum = [False, False, False]
             for h in fp.Hullcurves:
-                bbox = h.Shape.BoundBox
+                bbox = h.BoundBox
                 doScale = [False, False, False]
 
                 if bbox.XLength > epsilon: 
@@ -104,14 +127,31 @@ class CurvedSegment:
 
                 self.doScaleXYZ.append(doScale)
 
-            if fp.Items > 0:
-                self.makeRibs(fp)
+            adaptive = fp.AdaptiveTolerance > 0
+            if fp.Items > 0 or adaptive:
+                key = ShapeCache.featureKey(fp, ShapeCache.adaptiveProperties if adaptive else [])
+                shape = ShapeCache.lookup(key)
+                if shape is not None:
+                    fp.Shape = shape
+                else:
+                    if adaptive:
+                        positions = self.adaptivePositions(fp)
+                        if list(fp.Positions) != positions:
+                            fp.Positions = positions
+
+                    self.makeRibs(fp)
+                    ShapeCache.store(key, fp.Shape)
             self.update = True
         except Exception as ex:
             self.update = True
             raise ex
 
 
+    def onBeforeChange(self, fp, prop):
+        if prop == "AdaptiveTolerance":
+            self.adaptiveBefore = getattr(fp, "AdaptiveTolerance", None) or 0.0
+
+
     def onChanged(self, fp, prop):   
         if not hasattr(fp, 'LoftMaxDegree'):
             CurvedShapes.addObjectProperty(fp, "App::PropertyInteger", "LoftMaxDegree", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Max Degree for Surface or Solid"), init_val=5) # backwards compatibility - this upgrades older documents
@@ -121,38 +161,111 @@ class CurvedSegment:
             CurvedShapes.addObjectProperty(fp, "App::PropertyLink", "Path", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Sweep path"), init_val=None) # backwards compatibility - this upgrades older documents
         if not hasattr(fp, 'ForceInterpolated'):
             CurvedShapes.addObjectProperty(fp, "App::PropertyBool", "ForceInterpolated", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Force Interpolation of sketches"), init_val=False) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'SurfaceMode'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "SurfaceMode", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Loft: loft over the ribs. Direct: build a B-spline surface through compatible ribs without lofting")) # backwards compatibility - this upgrades older documents
+            fp.SurfaceMode = ['Loft', 'Direct']
+            fp.SurfaceMode = 'Loft'
+        if not hasattr(fp, 'ParallelLoft'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyBool", "ParallelLoft", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Loft the MaxLoftSize segments in parallel worker processes"), init_val=False) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'FrameMode'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyEnumeration", "FrameMode", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Tangent: turn each item onto the Path tangent. RotationMinimizing: keep the roll of the first item along the Path")) # backwards compatibility - this upgrades older documents
+            fp.FrameMode = ['Tangent', 'RotationMinimizing']
+            fp.FrameMode = 'Tangent'
+        if not hasattr(fp, 'Positions'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyFloatList", "Positions", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "Positions for items between the segments (as floats from 0.0 to 1.0) -- overrides Items and Distribution"), init_val=[]) # backwards compatibility - this upgrades older documents
+        if not hasattr(fp, 'AdaptiveTolerance'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyFloat", "AdaptiveTolerance", "CurvedSegment", QT_TRANSLATE_NOOP("App::Property", "If > 0, generate the Positions so that the items follow the shapes and hullcurves within this tolerance"), init_val=0.0) # backwards compatibility - this upgrades older documents
+
+        # the generated Positions must not override Items after the adaptive mode is switched off
+        if prop == "AdaptiveTolerance" and fp.AdaptiveTolerance <= 0 and getattr(self, "adaptiveBefore", 0.0) > 0:
+            fp.Positions = []
+
+        if "Positions" in prop and len(fp.Positions) != 0:
+            fp.Items = len(fp.Positions)
 
 
     def makeRibs(self, fp):
-        interpolate = False
-        if fp.ForceInterpolated or len(fp.Shape1.Shape.Edges) != len(fp.Shape2.Shape.Edges):
-            interpolate = True
+        ribKey = ShapeCache.featureKey(fp, ShapeCache.surfaceProperties, memoryOnly=True)
+        ribs = ShapeCache.lookupShapes(ribKey)
+        if ribs is None:
+            ribs = self.buildRibs(fp)
+            ShapeCache.storeShapes(ribKey, ribs)
+
+        if fp.makeSurface or fp.makeSolid:
+            fp.Shape = CurvedShapes.makeSurfaceSolid(ribs, fp.makeSolid, maxDegree=fp.LoftMaxDegree, maxLoftSize=fp.MaxLoftSize, surfaceMode=fp.SurfaceMode, parallel=fp.ParallelLoft, cacheKey=ribKey)
         else:
-            for e in range(0, len(fp.Shape1.Shape.Edges)):
-                edge1 = fp.Shape1.Shape.Edges[e]
-                edge2 = fp.Shape2.Shape.Edges[e]
-                curve1 = edge1.Curve.toBSpline(edge1.FirstParameter, edge1.LastParameter)
-                curve2 = edge2.Curve.toBSpline(edge2.FirstParameter, edge2.LastParameter)
-                poles1 = curve1.getPoles()
-                poles2 = curve2.getPoles()
-                if len(poles1) != len(poles2):
-                    interpolate = True
-                    break
+            fp.Shape = Part.makeCompound(ribs)
+
+
+    @RecomputeStats.timedPhase("ribs")
+    def buildRibs(self, fp):
+        curvePairs = None
+        if not fp.ForceInterpolated:
+            curvePairs = CurvedShapes.compatibleProfiles(fp.Shape1, fp.Shape2, fp.TwistReverse)
 
         makeStartEnd = fp.makeSurface or fp.makeSolid
-        if interpolate:
+        if curvePairs is None:
             ribs = makeRibsInterpolate(fp, fp.Items, False, makeStartEnd)
         else:
-            ribs = makeRibsSameShape(fp, fp.Items, False, makeStartEnd)
+            ribs = makeRibsSameShape(fp, fp.Items, False, makeStartEnd, curvePairs)
 
         self.rescaleRibs(fp, ribs)
+        return ribs
+
+
+    def adaptivePositions(self, fp):
+        """
+        Returns Positions where the poles of the items, their hullcurve bounds and their position on the Path 
+        deviate at most AdaptiveTolerance from a linear interpolation
+        """
+        curvePairs = None
+        if not fp.ForceInterpolated:
+            curvePairs = CurvedShapes.compatibleProfiles(fp.Shape1, fp.Shape2, fp.TwistReverse)
+
+        center1 = fp.Shape1.Shape.BoundBox.Center
+        center2 = fp.Shape2.Shape.BoundBox.Center
+        sampler = None
+        if fp.Path is not None and len(fp.Path.Edges) > 0:
+            sampler = CurvedShapes.pathSampler(fp.Path)
+            if sampler.Length <= 0:
+                sampler = None
+
+        def evaluate(fractions):
+            values = [[] for f in fractions]
+            if curvePairs:
+                planePoints, planeNormals = ribPlanes(fp, fractions, center1, center2)
+                for curve1, curve2 in curvePairs:
+                    poles1 = CurvedShapes.toArray(curve1.getPoles())
+                    poles2 = CurvedShapes.toArray(curve2.getPoles())
+                    newpoles = interpolatePoles(poles1, poles2, fractions, planePoints, planeNormals)
+                    for i in range(0, len(fractions)):
+                        values[i].append(newpoles[i].ravel())
+
+            if sampler:
+                positions, directions = sampler.sample([f * sampler.Length for f in fractions])
+            else:
+                positions = [CurvedShapes.vectorMiddle(center1, center2, f) for f in fractions]
+                directions = [CurvedShapes.vectorMiddle(fp.NormalShape1, fp.NormalShape2, f) for f in fractions]
 
-        if fp.makeSurface or fp.makeSolid:
-            fp.Shape = CurvedShapes.makeSurfaceSolid(ribs, fp.makeSolid, maxDegree=fp.LoftMaxDegree, maxLoftSize=fp.MaxLoftSize)
-        else:
-            fp.Shape = Part.makeCompound(ribs)
+            for i in range(0, len(fractions)):
+                values[i].append(np.array(tuple(positions[i])))
 
+            if len(fp.Hullcurves) > 0:
+                bboxes = CurvedShapes.boundboxes_from_intersect(fp.Hullcurves, positions, directions, self.doScaleXYZ)
+                for i in range(0, len(fractions)):
+                    if not bboxes[i]:
+                        values[i] = None
+                    else:
+                        b = bboxes[i]
+                        values[i].append(np.array([b.XMin, b.XMax, b.YMin, b.YMax, b.ZMin, b.ZMax]))
+
+            return [np.concatenate(v) if v is not None else None for v in values]
+
+        # the first and last station are Shape1 and Shape2
+        return CurvedShapes.adaptiveStations(evaluate, fp.AdaptiveTolerance)[1:-1]
 
+
+    @RecomputeStats.timedPhase("rescale")
     def rescaleRibs(self, fp, ribs):
         if (fp.makeSurface or fp.makeSolid) and fp.Path is None and abs(fp.Twist)<=epsilon:
             start = 1
@@ -163,39 +276,55 @@ class CurvedSegment:
             end = len(ribs) 
             items = fp.Items + 1
 
-        maxlen = 0   
-        edgelen = []
-        if fp.Path is not None:
-            edges = Part.__sortEdges__(fp.Path.Shape.Edges)
-            for edge in edges:
-                maxlen += edge.Length
-                edgelen.append(edge.Length)
+        sampler = None
+        if fp.Path is not None and len(fp.Path.Edges) > 0:
+            sampler = CurvedShapes.pathSampler(fp.Path)
+            if sampler.Length <= 0:
+                sampler = None
+
+        if len(fp.Positions) > 0:
+            allfractions = [0.0] + list(fp.Positions) + [1.0]
+            if len(ribs) == len(allfractions):
+                fractions = allfractions[start:end]
+            else:
+                fractions = allfractions[1:len(ribs) + 1]
+        else:
+            fractions = [CurvedShapes.distribute(i / items, fp.Distribution, fp.DistributionReverse) for i in range(start, end)]
+
+        if sampler:
+            points, tangents = sampler.sample([d * sampler.Length for d in fractions])
+
+        normals = [CurvedShapes.vectorMiddle(fp.NormalShape1, fp.NormalShape2, d) for d in fractions]
+        if sampler:
+            rotations = CurvedShapes.pathRotations(normals, points, tangents, fp.FrameMode)
 
         bc0=fp.Shape1.Shape.Placement.Base
         bc1=fp.Shape2.Shape.Placement.Base # makes rotating assymetric shapes easier - taking sketch origin into account
+        positions = []
+        directions = []
         for i in range(start, end):
-            d = CurvedShapes.distribute(i / items, fp.Distribution, fp.DistributionReverse)
-            normal = CurvedShapes.vectorMiddle(fp.NormalShape1, fp.NormalShape2, d)
+            d = fractions[i - start]
+            normal = normals[i - start]
             #Draft.makeLine(ribs[i].BoundBox.Center, ribs[i].BoundBox.Center + normal)
-            ribs[i] = ribs[i].rotate(bc0+d*(bc1-bc0), normal, fp.Twist * d)
+            rota = FreeCAD.Rotation(normal, fp.Twist * d)
             direction = normal
-            if maxlen>0:
-                plen = d * maxlen
-                for edge in edges:
-                    if plen > edge.Length: 
-                        plen -= edge.Length
-                    else:
-                        param = edge.getParameterByLength(plen)
-                        direction = edge.tangentAt(param) 
-                        posvec = edge.valueAt(param) 
-                        rotaxis = normal.cross(direction)
-                        angle = math.degrees(normal.getAngle(direction))
-                        if rotaxis.Length>epsilon:
-                            ribs[i] = ribs[i].rotate(bc0+d*(bc1-bc0), rotaxis, angle)
-                        ribs[i].Placement.Base = posvec
+            if sampler:
+                direction = tangents[i - start]
+                rota = rotations[i - start].multiply(rota)
+
+            # Twist and the rotation onto the path in one step
+            ribs[i] = ribs[i].rotate(bc0+d*(bc1-bc0), rota.Axis, math.degrees(rota.Angle))
+            if sampler:
+                ribs[i].Placement.Base = points[i - start]
 
             if len(fp.Hullcurves) > 0:
-                bbox = CurvedShapes.boundbox_from_intersect(fp.Hullcurves, ribs[i].BoundBox.Center, direction, self.doScaleXYZ)
+                positions.append(ribs[i].BoundBox.Center)
+                directions.append(direction)
+
+        if len(fp.Hullcurves) > 0:
+            bboxes = CurvedShapes.boundboxes_from_intersect(fp.Hullcurves, positions, directions, self.doScaleXYZ)
+            for i in range(start, end):
+                bbox = bboxes[i - start]
                 if bbox:
                     ribs[i] = CurvedShapes.scaleByBoundbox(ribs[i], bbox, self.doScaleXYZsum, copy=False)
 
@@ -238,13 +367,101 @@ def vectorMiddlePlaneNormal(vec1, vec2, fraction, normalShape1, normalShape2):
     return CurvedShapes.vectorMiddle(p1, p2, 0.5)
 
 
-def getMidPlane(fp, fraction):
-    midvec = CurvedShapes.vectorMiddle(fp.Shape1.Shape.BoundBox.Center, fp.Shape2.Shape.BoundBox.Center, fraction)
+def getMidPlane(fp, fraction, center1=None, center2=None):
+    if center1 is None:
+        center1 = fp.Shape1.Shape.BoundBox.Center
+    if center2 is None:
+        center2 = fp.Shape2.Shape.BoundBox.Center
+    midvec = CurvedShapes.vectorMiddle(center1, center2, fraction)
     midnorm = CurvedShapes.vectorMiddle(fp.NormalShape1, fp.NormalShape2, fraction)
     return Part.Plane(midvec, midnorm)
 
 
-def makeRibsSameShape(fp, items, alongNormal, makeStartEnd = False):
+def interpolatePoles(poles1, poles2, fractions, planePoints, planeNormals):
+    """
+    Vectorized version of vectorMiddlePlane for all poles of all ribs.
+    poles1, poles2: numpy arrays (n, 3) of matching poles of both profiles
+    fractions, planePoints, planeNormals: one entry per rib
+    Returns a numpy array (ribs, n, 3) with the intersections of the lines poles1->poles2 with the rib planes.
+    """
+    fractions = np.asarray(fractions, dtype=float)
+    direction = poles2 - poles1
+    denom = planeNormals.dot(direction.T)
+    num = np.einsum('ij,ij->i', planePoints, planeNormals)[:, None] - planeNormals.dot(poles1.T)
+    parallel = np.abs(denom) < epsilon
+    t = np.where(parallel, fractions[:, None], num / np.where(parallel, 1.0, denom))
+    return poles1[None, :, :] + t[:, :, None] * direction[None, :, :]
+
+
+def interpolatePolesNormal(poles1, poles2, fractions, normalShape1, normalShape2):
+    """
+    Vectorized version of vectorMiddlePlaneNormal for all poles of all ribs.
+    Returns a numpy array (ribs, n, 3)
+    """
+    fractions = np.asarray(fractions, dtype=float)
+    n1 = np.array([normalShape1.x, normalShape1.y, normalShape1.z])
+    n2 = np.array([normalShape2.x, normalShape2.y, normalShape2.z])
+
+    def middlePlaneNormal1(vec1, vec2, nvec1, nvec2, normal1, normal2):
+        rota90 = FreeCAD.Rotation(normal1.cross(normal2), 90)
+        n90 = rota90.multVec(normal1)
+        n90 = np.array([n90.x, n90.y, n90.z])
+        denom = nvec2.dot(n90)
+        if abs(denom) < epsilon:
+            return vec1
+
+        t = (vec1 - vec2).dot(n90) / denom
+        return vec2 + t[:, None] * nvec2[None, :]
+
+    p1 = middlePlaneNormal1(poles1, poles2, n1, n2, normalShape1, normalShape2)
+    p2 = middlePlaneNormal1(poles2, poles1, n2, n1, normalShape2, normalShape1)
+    middle = (p1 + p2) / 2
+
+    result = np.empty((len(fractions),) + poles1.shape)
+    for i in range(len(fractions)):
+        if fractions[i] == 0:
+            result[i] = poles1
+        elif fractions[i] == 1:
+            result[i] = poles2
+        else:
+            result[i] = middle
+
+    return result
+
+
+def ribFractions(fp, items, start, end):
+    if len(getattr(fp, "Positions", [])) > 0:
+        return ([0.0] + list(fp.Positions) + [1.0])[start:end]
+
+    fractions = []
+    for i in range(start, end): 
+        if hasattr(fp, "Distribution"):
+            fractions.append(CurvedShapes.distribute(i / (items + 1), fp.Distribution, fp.DistributionReverse))
+        else:
+            fractions.append(i / (items + 1))
+
+    return fractions
+
+
+def ribPlanes(fp, fractions, center1, center2):
+    """Returns the points and normals of the rib planes (see getMidPlane) as numpy arrays"""
+    f = np.asarray(fractions, dtype=float)[:, None]
+    c1 = np.array([center1.x, center1.y, center1.z])
+    c2 = np.array([center2.x, center2.y, center2.z])
+    n1 = np.array([fp.NormalShape1.x, fp.NormalShape1.y, fp.NormalShape1.z])
+    n2 = np.array([fp.NormalShape2.x, fp.NormalShape2.y, fp.NormalShape2.z])
+    return c1 + (c2 - c1) * f, n1 + (n2 - n1) * f
+
+
+@RecomputeStats.timedPhase("interpolate")
+def makeRibsSameShape(fp, items, alongNormal, makeStartEnd = False, curvePairs = None):
+    """
+    Interpolates the poles of compatible B-spline curves of Shape1 and Shape2.
+    curvePairs are the pairs of curves from CurvedShapes.compatibleProfiles
+    """
+    if curvePairs is None:
+        curvePairs = CurvedShapes.compatibleProfiles(fp.Shape1, fp.Shape2, fp.TwistReverse)
+
     ribs = []
 
     base1=fp.Shape1.Placement.Base
@@ -256,38 +473,34 @@ def makeRibsSameShape(fp, items, alongNormal, makeStartEnd = False):
     else:
         start=1
         end=items+1
-    for i in range(start, end): 
-        if hasattr(fp, "Distribution"):
-            fraction = CurvedShapes.distribute(i / (items + 1), fp.Distribution, fp.DistributionReverse)
+
+    shape1 = fp.Shape1.Shape
+    shape2 = fp.Shape2.Shape
+    fractions = ribFractions(fp, items, start, end)
+    planePoints, planeNormals = ribPlanes(fp, fractions, shape1.BoundBox.Center, shape2.BoundBox.Center)
+    # coordinates have fraction*offset substracted to force the shape to be centered on itself, important for later rotation on path
+    shift = np.asarray(fractions, dtype=float)[:, None, None] * np.array([offset.x, offset.y, offset.z])
+
+    curves1 = []
+    ribpoles = []
+    for curve1, curve2 in curvePairs:
+        poles1 = CurvedShapes.toArray(curve1.getPoles())
+        poles2 = CurvedShapes.toArray(curve2.getPoles())
+        if alongNormal:
+            newpoles = interpolatePolesNormal(poles1, poles2, fractions, fp.NormalShape1, fp.NormalShape2)
         else:
-            fraction = i / (items + 1)
+            newpoles = interpolatePoles(poles1, poles2, fractions, planePoints, planeNormals)
 
-        plane = getMidPlane(fp, fraction)
+        curves1.append(curve1)
+        ribpoles.append(newpoles - shift)
 
+    for i in range(0, len(fractions)):
         edges = []
         curves = []
-        edges2 = fp.Shape2.Shape.Edges.copy()
-        if fp.TwistReverse:
-            edges2.reverse()
-
-        for e in range(0, len(fp.Shape1.Shape.Edges)):
-            edge1 = fp.Shape1.Shape.Edges[e]
-            edge2 = edges2[e]
-            curve1 = edge1.Curve.toBSpline(edge1.FirstParameter, edge1.LastParameter)
-            curve2 = edge2.Curve.toBSpline(edge2.FirstParameter, edge2.LastParameter)
-            poles1 = curve1.getPoles()
-            poles2 = curve2.getPoles()
-
-            newpoles = []
-            for p in range(len(poles1)):
-                if alongNormal:
-                    newpoles.append(vectorMiddlePlaneNormal(poles1[p], poles2[p], fraction, fp.NormalShape1, fp.NormalShape2)-fraction*offset)
-                else:
-                    newpoles.append(vectorMiddlePlane(poles1[p], poles2[p], fraction, plane)-fraction*offset)
-                # coordinate has fraction*offset substracted to force the shape to be centered on itself, important for later rotation on path
-
+        for e in range(0, len(curves1)):
+            curve1 = curves1[e]
             newcurve = Part.BSplineCurve()
-            newcurve.buildFromPolesMultsKnots(newpoles, 
+            newcurve.buildFromPolesMultsKnots(CurvedShapes.toVectors(ribpoles[e][i]), 
                                       curve1.getMultiplicities(), 
                                       curve1.getKnots(), 
                                       curve1.isPeriodic(), 
@@ -307,25 +520,26 @@ def makeRibsSameShape(fp, items, alongNormal, makeStartEnd = False):
                 ribs.append(curves[0]) 
             else:
                 ribs.append(Part.makeCompound(curves))
-        ribs[-1].Placement.Base=fraction*offset #place the whole rib in the right place instead
+        ribs[-1].Placement.Base=fractions[i]*offset #place the whole rib in the right place instead
 
     if makeStartEnd and fp.Path is None and abs(fp.Twist)<=epsilon:
-        ribs.insert(0, fp.Shape1.Shape)
-        ribs.append(fp.Shape2.Shape)
+        ribs.insert(0, shape1)
+        ribs.append(shape2)
 
     return ribs
 
 
+@RecomputeStats.timedPhase("interpolate")
 def makeRibsInterpolate(fp, items, alongNormal, makeStartEnd = False):
-    s1=fp.Shape1.Shape.toNurbs()
-    s2=fp.Shape2.Shape.toNurbs()
+    s1=fp.Shape1.Shape
+    s2=fp.Shape2.Shape
     len1 = len(s1.Edges)
     len2 = len(s2.Edges)
 
     nr_edges = int(len1 * len2 / math.gcd(len1, len2))
 
-    pointslist1 = EdgesToPoints(s1, int(nr_edges / len1), int(fp.InterpolationPoints))
-    pointslist2 = EdgesToPoints(s2, int(nr_edges / len2), int(fp.InterpolationPoints), fp.TwistReverse)
+    pointslist1 = profilePoints(fp.Shape1, int(nr_edges / len1), int(fp.InterpolationPoints))
+    pointslist2 = profilePoints(fp.Shape2, int(nr_edges / len2), int(fp.InterpolationPoints), fp.TwistReverse)
 
     ribs = []
     if makeStartEnd:
@@ -338,32 +552,31 @@ def makeRibsInterpolate(fp, items, alongNormal, makeStartEnd = False):
     base1=s1.Placement.Base
     base2=s2.Placement.Base
     offset=base2-base1
-    for i in range(start, end):
-        if hasattr(fp, "Distribution"):
-            fraction = CurvedShapes.distribute(i / (items + 1), fp.Distribution, fp.DistributionReverse)
+    center1 = fp.Shape1.Shape.BoundBox.Center
+    center2 = fp.Shape2.Shape.BoundBox.Center
+    fractions = ribFractions(fp, items, start, end)
+    planePoints, planeNormals = ribPlanes(fp, fractions, center1, center2)
+    # coordinates have fraction*offset substracted to force the shape to be centered on itself, important for later rotation on path
+    shift = np.asarray(fractions, dtype=float)[:, None, None] * np.array([offset.x, offset.y, offset.z])
+
+    # the curves of all ribs for each edge
+    edgecurves = []
+    for l in range(0, len(pointslist1)):
+        points1 = pointslist1[l]
+        points2 = pointslist2[l]
+        if fp.TwistReverse:
+            points2 = points2[::-1]
+
+        if alongNormal:
+            newpoints = interpolatePolesNormal(points1, points2, fractions, fp.NormalShape1, fp.NormalShape2)
         else:
-            fraction = i / (items + 1)
-
-        plane = getMidPlane(fp, fraction)
-        newshape = []
-        for l in range(0, len(pointslist1)):
-            points1 = pointslist1[l]
-            points2 = pointslist2[l]
-            if(fp.TwistReverse):
-                points2.reverse()
-
-            newpoles = []
-            for p in range(0, fp.InterpolationPoints):
-                if alongNormal:
-                    newpoles.append(vectorMiddlePlaneNormal(points1[p], points2[p], fraction, fp.NormalShape1, fp.NormalShape2) - fraction * offset)
-                else:
-                    newpoles.append(vectorMiddlePlane(points1[p], points2[p], fraction, plane)-fraction*offset)
-                # coordinate has fraction*offset substracted to force the shape to be centered on itself, important for later rotation on path
+            newpoints = interpolatePoles(points1, points2, fractions, planePoints, planeNormals)
 
-            bc = Part.BSplineCurve()
-            bc.approximate(newpoles)
-            newshape.append(bc)
+        edgecurves.append(CurvedShapes.fitCurves(newpoints - shift))
 
+    for i in range(0, len(fractions)):
+        fraction = fractions[i]
+        newshape = [curves[i] for curves in edgecurves]
         if len(newshape) == 1:
             sh = newshape[0].toShape()
             try:
@@ -387,6 +600,28 @@ def makeRibsInterpolate(fp, items, alongNormal, makeStartEnd = False):
     return ribs
 
 
+_profilePoints = OrderedDict()
+
+def profilePoints(profile, nr_frac, points_per_edge, twistReverse = False):
+    """
+    Cached EdgesToPoints of a linked profile object as a read-only numpy array (edges, points_per_edge, 3).
+    Features that use the same profile share the discretization.
+    """
+    key = (ShapeCache.linkFingerprint(profile), nr_frac, points_per_edge, twistReverse)
+    points = _profilePoints.get(key)
+    if points is None:
+        llpoints = EdgesToPoints(profile.Shape.toNurbs(), nr_frac, points_per_edge, twistReverse)
+        points = np.array([[(v.x, v.y, v.z) for v in edgepoints] for edgepoints in llpoints], dtype=float)
+        points.setflags(write=False)
+        _profilePoints[key] = points
+        if len(_profilePoints) > 64:
+            _profilePoints.popitem(last=False)
+    else:
+        _profilePoints.move_to_end(key)
+
+    return points
+
+
 def EdgesToPoints(shape, nr_frac, points_per_edge, twistReverse = False):
     edges = [] 
     sortedEdges=sum(Part.sortEdges(shape.Edges),[])
@@ -540,5 +775,7 @@ if FreeCAD.GuiUp:
                     'ToolTip' : QT_TRANSLATE_NOOP("CurvedPathSegment", __doc__ + " along a path")}
 
 
-    FreeCADGui.addCommand('CurvedSegment', CurvedSegmentCommand())
-    FreeCADGui.addCommand('CurvedPathSegment', CurvedPathSegmentCommand())
+    if 'CurvedSegment' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('CurvedSegment', CurvedSegmentCommand())
+    if 'CurvedPathSegment' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('CurvedPathSegment', CurvedPathSegmentCommand())
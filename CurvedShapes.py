@@ -1,10 +1,16 @@
 # coding=utf-8
 import os
+import sys
+import time
 import FreeCAD
 from FreeCAD import Vector
 import Part
 import math
+from collections import OrderedDict
+import numpy as np
 import CompoundTools.Explode
+import ShapeCache
+import RecomputeStats
 
 epsilon = 1e-7
 translate = FreeCAD.Qt.translate
@@ -32,6 +38,152 @@ def get_module_path():
     return os.path.dirname(__file__)
 
 
+class ShapeSnapshot:
+    """
+    Stand-in for a linked document object that fetches its Shape only once.
+    Every access to obj.Shape returns a new copy of the TopoShape, so the features take 
+    a snapshot of their inputs at the beginning of execute() and pass that to the rib builders.
+    All other attributes are read from the linked object.
+    """
+    def __init__(self, obj):
+        # a plain Part.Shape is its own linked object, e.g. in the build functions
+        shape = obj if isinstance(obj, Part.Shape) else obj.Shape
+        self.__dict__['Object'] = obj
+        self.__dict__['Shape'] = shape
+        self.__dict__['Edges'] = shape.Edges
+        self.__dict__['BoundBox'] = shape.BoundBox
+
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['Object'], name)
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ShapeSnapshot is read-only")
+
+
+    def fingerprint(self):
+        """Returns the ShapeCache fingerprint of the shape, it is computed only once"""
+        if 'Fingerprint' not in self.__dict__:
+            self.__dict__['Fingerprint'] = ShapeCache.fingerprint(self.__dict__['Shape'])
+        return self.__dict__['Fingerprint']
+
+
+class FeatureSnapshot:
+    """
+    Wraps a FeaturePython object for one execute() and replaces the linked objects in links by ShapeSnapshots.
+    Reading and writing all other properties is passed through to the feature.
+    """
+    def __init__(self, fp, links):
+        self.__dict__['Object'] = fp
+        for name in links:
+            val = getattr(fp, name, None)
+            if isinstance(val, list):
+                val = [snapshot(o) for o in val]
+            else:
+                val = snapshot(val)
+
+            self.__dict__[name] = val
+
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['Object'], name)
+
+
+    def __setattr__(self, name, value):
+        setattr(self.__dict__['Object'], name, value)
+
+
+def snapshot(obj):
+    """Returns a ShapeSnapshot of obj, or obj itself if it has no Shape or is a snapshot already"""
+    if isinstance(obj, Part.Shape):
+        return ShapeSnapshot(obj)
+    if obj is None or isinstance(obj, ShapeSnapshot) or not hasattr(obj, 'Shape'):
+        return obj
+    return ShapeSnapshot(obj)
+
+
+class FeatureParameters:
+    """
+    Document free stand-in for a Part::FeaturePython object, used by the build functions.
+    It holds the properties the proxies add, converts values like FreeCAD properties do 
+    and calls onBeforeChange() and onChanged() of the proxy for each change.
+    Linked objects may be plain Part.Shapes.
+    """
+    def __init__(self):
+        self.__dict__['_types'] = {}
+        self.__dict__['_enums'] = {}
+        self.__dict__['Proxy'] = None
+        self.__dict__['ViewObject'] = None
+        self.__dict__['TypeId'] = "Part::FeaturePython"
+        self.__dict__['Shape'] = Part.Shape()
+        self.__dict__['Placement'] = FreeCAD.Placement()
+
+
+    @property
+    def PropertiesList(self):
+        return list(self._types.keys())
+
+
+    def addProperty(self, ptype, name, group="", doc="", attr=0):
+        if name not in self._types:
+            self._types[name] = ptype
+            self.__dict__[name] = None
+        return self
+
+
+    def getTypeIdOfProperty(self, name):
+        return self._types.get(name, "")
+
+
+    def getEnumerationsOfProperty(self, name):
+        return self._enums.get(name, [])
+
+
+    def __setattr__(self, name, value):
+        ptype = self._types.get(name)
+        if ptype == "App::PropertyEnumeration" and isinstance(value, list):
+            self._enums[name] = value
+            value = self.__dict__.get(name) if self.__dict__.get(name) in value else value[0]
+        elif ptype in ("App::PropertyQuantity", "App::PropertyFloat") and value is not None:
+            value = float(value)
+        elif ptype == "App::PropertyInteger" and value is not None:
+            value = int(value)
+        elif ptype == "App::PropertyVector" and value is not None:
+            value = Vector(value)
+        elif ptype == "App::PropertyLink":
+            value = snapshot(value)
+        elif ptype == "App::PropertyLinkList":
+            value = [snapshot(o) for o in (value or [])]
+        elif ptype == "App::PropertyFloatList":
+            value = [float(v) for v in (value or [])]
+
+        proxy = self.__dict__['Proxy']
+        if name != "Proxy" and proxy is not None and hasattr(proxy, "onBeforeChange"):
+            proxy.onBeforeChange(self, name)
+
+        self.__dict__[name] = value
+        if name == "Shape":
+            self.__dict__['Placement'] = value.Placement
+        elif name == "Placement":
+            # like a Part::Feature, the placement moves the shape
+            value = FreeCAD.Placement(value)
+            self.__dict__['Placement'] = value
+            if not self.__dict__['Shape'].isNull():
+                shape = self.__dict__['Shape'].copy(False)
+                shape.Placement = value
+                self.__dict__['Shape'] = shape
+
+        if name != "Proxy" and proxy is not None and hasattr(proxy, "onChanged"):
+            proxy.onChanged(self, name)
+
+
+    def recompute(self):
+        """Runs execute() of the proxy and returns the Shape"""
+        self.Proxy.execute(self)
+        return self.Shape
+
+
 def scale(shape, delta=Vector(1,1,1), center=Vector(0,0,0), copy=True):
     if copy:
         sh = shape.copy()
@@ -49,6 +201,7 @@ def scale(shape, delta=Vector(1,1,1), center=Vector(0,0,0), copy=True):
     m = FreeCAD.Matrix()
     m.scale(delta)
     sh = sh.transformGeometry(m)
+    RecomputeStats.count("transformGeometry")
     corr = Vector(center.x,center.y,center.z)
     corr.scale(delta.x,delta.y,delta.z)
     corr = (corr.sub(center)).negative()
@@ -57,87 +210,219 @@ def scale(shape, delta=Vector(1,1,1), center=Vector(0,0,0), copy=True):
     return sh
 
 
+def locatedShape(shape, placement):
+    """
+    Returns shape at placement. The result shares the geometry with shape, only the location differs,
+    so arrays of unscaled items cost almost no memory. Older FreeCAD versions without located() get a copy.
+    """
+    if hasattr(shape, 'located'):
+        return shape.located(placement)
+
+    dolly = shape.copy()
+    dolly.Placement = placement
+    return dolly
+
+
 def PointVec(point):
     """Converts a Part::Point to a FreeCAD::Vector"""
     return Vector(point.X, point.Y, point.Z)
 
 
+def toArray(vectors):
+    """Converts a list of FreeCAD::Vector to a numpy array of shape (n, 3)"""
+    return np.array([(v.x, v.y, v.z) for v in vectors], dtype=float).reshape(-1, 3)
+
+
+def toVectors(array):
+    """Converts a numpy array of shape (n, 3) to a list of FreeCAD::Vector"""
+    return [Vector(float(p[0]), float(p[1]), float(p[2])) for p in array]
+
+
 def boundbox_from_intersect(curves, pos, normal, doScaleXYZ, nearestpoints=True):
     if len(curves) == 0:
         return None
 
-    plane = Part.Plane(pos, normal)
-    xmin = float("inf")
-    xmax = float("-inf")
-    ymin = float("inf")
-    ymax = float("-inf")
-    zmin = float("inf")
-    zmax = float("-inf")
-    found = False
+    return boundboxes_from_intersect(curves, [pos], [normal], doScaleXYZ, nearestpoints)[0]
+
+
+def hullcurveSamples(curve):
+    """
+    Samples every edge of a hullcurve once.
+    Returns a list of (edge, parameters, points) tuples with points as numpy array.
+    The samples are dense enough to bracket every crossing of a plane with the edge.
+    """
+    samples = []
+    for edge in curve.Shape.Edges:
+        if isinstance(edge.Curve, (Part.Line, Part.LineSegment)):
+            nr = 2
+        elif hasattr(edge.Curve, 'NbPoles'):
+            nr = max(16, edge.Curve.NbPoles * 4)
+        else:
+            nr = 32
+
+        first = edge.FirstParameter
+        last = edge.LastParameter
+        params = [first + (last - first) * i / (nr - 1) for i in range(nr)]
+        points = toArray([edge.valueAt(t) for t in params])
+        samples.append((edge, params, points))
+
+    return samples
+
+
+def _planeCrossing(edge, t0, t1, d0, d1, pos, normal):
+    """Finds the parameter where edge crosses the plane between t0 and t1 (regula falsi, Illinois variant)"""
+    side = 0
+    t = t0
+    for i in range(0, 50):
+        t = (t0 * d1 - t1 * d0) / (d1 - d0)
+        d = (edge.valueAt(t) - pos).dot(normal)
+        if abs(d) < epsilon or abs(t1 - t0) < epsilon:
+            break
+
+        if (d > 0) == (d1 > 0):
+            t1 = t
+            d1 = d
+            if side == -1:
+                d0 /= 2
+            side = -1
+        else:
+            t0 = t
+            d0 = d
+            if side == 1:
+                d1 /= 2
+            side = 1
+
+    return edge.valueAt(t)
+
+
+def _addIntersection(ipoints, p, pos, nearestpoints):
+    if len(ipoints) < 2: 
+        ipoints.append(p) 
+    elif nearestpoints:
+        distp = (pos - p).Length
+        dist0 = (pos - ipoints[0]).Length
+        dist1 = (pos - ipoints[1]).Length
+
+        if distp < dist0 or distp < dist1:
+            if dist1 < dist0:
+                ipoints[0] = p
+            else:
+                ipoints[1] = p
+    else:
+        distp = (ipoints[0] - ipoints[1]).Length
+        dist0 = (p - ipoints[0]).Length
+        dist1 = (p - ipoints[1]).Length
+        if distp < dist0 or distp < dist1:
+            if dist1 > dist0:
+                ipoints[0] = p
+            else:
+                ipoints[1] = p
+
+
+def _exactCrossings(edge, pos, normal):
+    """Returns the intersections of edge with the plane computed by OCCT, like the unbatched intersection did"""
+    points = []
+    i = Part.Plane(pos, normal).intersect(edge.Curve)
+    RecomputeStats.count("intersect")
+    if i:
+        for p in i[0]:
+            if Part.Vertex(p).distToShape(edge)[0] < epsilon:
+                points.append(Vector(p.X, p.Y, p.Z))
+
+    return points
+
+
+def _sampleCrossings(edge, params, points, pos, nrm, offsets):
+    """
+    Yields (station, point) for the crossings of edge with all station planes, in the order along the edge.
+    The crossings are detected on the samples of the edge with one masked operation for all stations.
+    """
+    # signed distances of all samples to all station planes
+    dist = points.dot(nrm.T) - offsets
+    zero = np.abs(dist) < epsilon
+    events = zero.copy()
+    events[:-1] |= (dist[:-1] * dist[1:] < 0) & ~zero[:-1] & ~zero[1:]
+
+    # a turning point of the distance that is closer to the plane than the neighbouring steps
+    # may hide two crossings between two samples, there the crossings are computed exactly
+    exact = np.zeros(len(offsets), dtype=bool)
+    if len(dist) > 2:
+        steps = np.diff(dist, axis=0)
+        reach = np.maximum(np.abs(steps[:-1]), np.abs(steps[1:]))
+        turns = (steps[:-1] * steps[1:] < 0) & (np.abs(dist[1:-1]) < reach)
+        exact = turns.any(axis=0)
+        events[:, exact] = False
+
+    for k, s in zip(*np.nonzero(events)):
+        if zero[k, s]:
+            yield s, Vector(*points[k])
+        else:
+            RecomputeStats.count("intersect")
+            yield s, _planeCrossing(edge, params[k], params[k + 1], dist[k, s], dist[k + 1, s], Vector(*pos[s]), Vector(*nrm[s]))
+
+    for s in np.nonzero(exact)[0]:
+        for p in _exactCrossings(edge, Vector(*pos[s]), Vector(*nrm[s])):
+            yield s, p
+
+
+@RecomputeStats.timedPhase("boundboxes")
+def boundboxes_from_intersect(curves, positions, normals, doScaleXYZ, nearestpoints=True, samples=None):
+    """
+    Batched version of boundbox_from_intersect for many rib stations at once.
+    Every hullcurve is sampled only once (or pass the result of hullcurveSamples for each curve in samples).
+    The plane crossings of all stations are detected together on the samples and then solved on the edges.
+    Returns a list with a FreeCAD.BoundBox or None for each station.
+    """
+    nr = len(positions)
+    if len(curves) == 0 or nr == 0:
+        return [None] * nr
+
+    if samples is None:
+        samples = [hullcurveSamples(curve) for curve in curves]
+
+    pos = toArray(positions)
+    nrm = toArray(normals)
+    offsets = np.einsum('ij,ij->i', pos, nrm)
+
+    low = np.full((nr, 3), np.inf)
+    high = np.full((nr, 3), -np.inf)
+    found = np.zeros(nr, dtype=bool)
+    valid = np.ones(nr, dtype=bool)
+
     for n in range(0, len(curves)):
-        curve = curves[n]
-        ipoints = []
-        for edge in curve.Shape.Edges:
-            i = plane.intersect(edge.Curve)   
-            if i: 
-                for p in i[0]:
-                    vert=Part.Vertex(p)
-                    if vert.distToShape(edge)[0] < epsilon:
-                        if len(ipoints) < 2: 
-                            ipoints.append(p) 
-                        else:    
-                            if nearestpoints:
-                                distp = (pos - PointVec(p)).Length
-                                dist0 = (pos - PointVec(ipoints[0])).Length
-                                dist1 = (pos - PointVec(ipoints[1])).Length
-
-                                if distp < dist0 or distp < dist1:
-                                    if dist1 < dist0:
-                                        ipoints[0] = p
-                                    else:
-                                        ipoints[1] = p
-                            else:
-                                distp = (PointVec(ipoints[0]) - PointVec(ipoints[1])).Length
-                                dist0 = (PointVec(p) - PointVec(ipoints[0])).Length
-                                dist1 = (PointVec(p) - PointVec(ipoints[1])).Length
-                                if distp < dist0 or distp < dist1:
-                                    if dist1 > dist0:
-                                        ipoints[0] = p
-                                    else:
-                                        ipoints[1] = p
-
-                        found = True
-
-        if found == False:
-            return None
+        # the two intersections of each station with this curve that are kept
+        ipoints = {}
+        for edge, params, points in samples[n]:
+            for s, p in _sampleCrossings(edge, params, points, pos, nrm, offsets):
+                _addIntersection(ipoints.setdefault(s, []), p, Vector(*pos[s]), nearestpoints)
+
+        cpoints = np.full((nr, 2, 3), np.nan)
+        count = np.zeros(nr, dtype=int)
+        for s, plist in ipoints.items():
+            cpoints[s, :len(plist)] = [(p.x, p.y, p.z) for p in plist]
+            count[s] = len(plist)
+
+        found |= count > 0
+        valid &= found
+
+        # with two intersections only the directions in doScaleXYZ are used
+        use = np.where((count > 1)[:, None], np.array(doScaleXYZ[n], dtype=bool)[None, :], True)
+        cpoints[~np.broadcast_to(use[:, None, :], cpoints.shape)] = np.nan
+        low = np.fmin(low, np.fmin.reduce(cpoints, axis=1))
+        high = np.fmax(high, np.fmax.reduce(cpoints, axis=1))
+
+    empty = np.isinf(low) | np.isinf(high)
+    low[empty] = 0
+    high[empty] = 0
+
+    bboxes = []
+    for s in range(nr):
+        if not valid[s]:
+            bboxes.append(None)
+        else:
+            bboxes.append(FreeCAD.BoundBox(*(float(v) for v in low[s]), *(float(v) for v in high[s])))
 
-        use_x = True
-        use_y = True
-        use_z = True
-        if len(ipoints) > 1:
-            use_x = doScaleXYZ[n][0]
-            use_y = doScaleXYZ[n][1]
-            use_z = doScaleXYZ[n][2] 
-
-        for p in ipoints:
-            if use_x and p.X > xmax: xmax = p.X
-            if use_x and p.X < xmin: xmin = p.X
-            if use_y and p.Y > ymax: ymax = p.Y
-            if use_y and p.Y < ymin: ymin = p.Y
-            if use_z and p.Z > zmax: zmax = p.Z
-            if use_z and p.Z < zmin: zmin = p.Z
-
-    if xmin == float("inf") or xmax == float("-inf"):
-        xmin = 0
-        xmax = 0
-    if ymin == float("inf") or ymax == float("-inf"):
-        ymin = 0
-        ymax = 0
-    if zmin == float("inf") or zmax == float("-inf"):
-        zmin = 0
-        zmax = 0
-
-    return FreeCAD.BoundBox(xmin, ymin, zmin, xmax, ymax, zmax)
+    return bboxes
 
 
 def scaleByBoundbox(shape, boundbox, doScaleXYZ, copy=True):
@@ -176,9 +461,7 @@ def scaleByBoundbox(shape, boundbox, doScaleXYZ, copy=True):
     return dolly
 
 
-def makeSurfaceSolid(ribs, solid, maxDegree=5, maxLoftSize=16):
-    surfaces = []
-
+def ribWires(ribs):
     wiribs = []
     for r in ribs:
         if len(r.Wires) > 0:
@@ -188,72 +471,617 @@ def makeSurfaceSolid(ribs, solid, maxDegree=5, maxLoftSize=16):
                 wiribs.append(Part.Wire(r.Edges))
             except Exception as ex:
                 FreeCAD.Console.PrintError(translate("Curved Shapes", "Cannot make a wire. Creation of surface is not possible!") + "\n")
-                return
+                return None
+
+    return wiribs
+
+
+def loftChunks(count, maxLoftSize):
+    """
+    Returns the (first, last) rib indices of the lofts for count ribs
+    """
+    # OCCT has issues with lofts over large number of segments.
+    # Lofts take very long to compute and end up very very broken in shape.
+    # To prevent this, we split the loft into finite segments of no more than maxLoftSize ribs
+    # after an initial set of sm sections of length maxLoftSize, there are one or two final sections
+    # with less then maxLoftSize of roughly equal length.
+    # this avoids introducing very small sections, which might not smooth out nicely
+    # while ensuring no section has more than maxLoftSize
+    # si (segment iterator) is the default number of ribs per loft
+    # st (segment total) is the number of segments
+    # sm (segment maximum) is the number of full lofts of size si
+    # s0 is the first rib of the final shorter segment(s)
+    # s2 is the size of the final segment area
+    # s1 is the mid-point between s0 and s2 for the final two segments if s2>maxLoftSize
+    # or equal to s0 in case there is only one final segment
+    # if s2<maxLoftSize, then the final segment is the only segment
+    st = count-1
+    si = st
+    sm = 0
+    if maxLoftSize>0:
+        sm = (st // maxLoftSize)-1
+        si = maxLoftSize
+    s0 = sm * si
+    if (s0 < 0):
+        s0 = 0
+    s2 = st-s0
+    s1 = s0
+    if (s2 > maxLoftSize and maxLoftSize > 0):
+        s1 = s0 + (s2 // 2)
+
+    chunks = []
+    for s in range(0,sm):
+        chunks.append((s*si, (s+1)*si))
+    if (s1 > s0):
+        chunks.append((s0, s1))
+    chunks.append((s1, st))
+    return chunks
+
+
+def parameters():
+    return FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/CurvedShapes")
+
+
+def processPool(maxWorkers=None):
+    """
+    Returns a ProcessPoolExecutor for OCCT work in worker processes, or None if this is not possible.
+    If FreeCAD runs in a Python interpreter, the workers are started by a fork server or spawned.
+    The FreeCAD executable cannot start a clean interpreter, there the workers are forked. A forked copy of the
+    GUI with its threads can deadlock, so in the GUI this is only done if the ParallelInGui parameter is set.
+    Shapes must be passed to the workers as BREP strings.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    methods = multiprocessing.get_all_start_methods()
+    if os.path.basename(sys.executable or "").lower().startswith("python"):
+        method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    elif 'fork' in methods and (not FreeCAD.GuiUp or parameters().GetBool("ParallelInGui", False)):
+        method = 'fork'
+    else:
+        return None
+
+    if not maxWorkers:
+        maxWorkers = os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context(method))
+
+
+def recomputeWorkers(tasks):
+    """
+    Number of worker processes for tasks of one recompute. Each worker is a copy of FreeCAD,
+    so there are at most MaxWorkers (parameter, default 4) of them.
+    """
+    return max(1, min(tasks, os.cpu_count() or 1, parameters().GetInt("MaxWorkers", 4)))
+
 
+def workerTimeout():
+    """Seconds to wait for the results of worker processes (WorkerTimeout parameter)"""
+    return parameters().GetInt("WorkerTimeout", 300)
+
+
+def stopPool(pool, futures=()):
+    """
+    Kills the workers of pool, cancels the futures that did not start and shuts pool down without waiting,
+    so a hung worker does not block FreeCAD
+    """
+    # ProcessPoolExecutor has no public way to terminate its workers before Python 3.14
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.kill()
+    # shutdown(cancel_futures=True) needs Python 3.9, FreeCAD 0.19 has Python 3.8
+    for future in futures:
+        future.cancel()
+    pool.shutdown(wait=False)
+
+
+def poolMap(pool, func, tasks, timeout=None):
+    """
+    Runs func(*args) for each args of tasks in pool and returns the results in the order of tasks.
+    Raises BrokenProcessPool if a worker crashed and TimeoutError if the results are not ready within
+    timeout seconds (default workerTimeout()). Then the workers are killed. The attribute task of the
+    TimeoutError is the index of the first unfinished task.
+    """
+    from concurrent.futures import TimeoutError
+    if timeout is None:
+        timeout = workerTimeout()
+
+    deadline = time.monotonic() + timeout
+    futures = []
+    results = []
     try:
-        # OCCT has issues with lofts over large number of segments.
-        # Lofts take very long to compute and end up very very broken in shape.
-        # To prevent this, we split the loft into finite segments of no more than maxLoftSize ribs
-        # after an initial set of sm sections of length maxLoftSize, there are one or two final sections
-        # with less then maxLoftSize of roughly equal length.
-        # this avoids introducing very small sections, which might not smooth out nicely
-        # while ensuring no section has more than maxLoftSize
-        # si (segment iterator) is the default number of ribs per loft
-        # st (segment total) is the number of segments
-        # sm (segment maximum) is the number of full lofts of size si
-        # s0 is the first rib of the final shorter segment(s)
-        # s2 is the size of the final segment area
-        # s1 is the mid-point between s0 and s2 for the final two segments if s2>maxLoftSize
-        # or equal to s0 in case there is only one final segment
-        # if s2<maxLoftSize, then the final segment is the only segment
-        st = len(wiribs)-1
-        si = st
-        sm = 0
-        if maxLoftSize>0:
-            sm = (st // maxLoftSize)-1
-            si = maxLoftSize
-        s0 = sm * si
-        if (s0 < 0):
-            s0 = 0
-        s2 = st-s0
-        s1 = s0
-        if (s2 > maxLoftSize and maxLoftSize > 0):
-            s1 = s0 + (s2 // 2)
-        #FreeCAD.Console.PrintWarning("total segments: %i \n"%st)
-        #FreeCAD.Console.PrintWarning("total sections: %i of max %i\n"%(max(0,sm)+1+(1 if s1>s0 else 0),si))
-        for s in range(0,sm):
-            #FreeCAD.Console.PrintWarning("full section %i  from %i to %i\n"%(s,s*si,(s+1)*si))
-            loft = Part.makeLoft(wiribs[s*si:(s+1)*si+1],False,False,False,maxDegree)
-            surfaces += loft.Faces
-        if (s1 > s0):
-            #FreeCAD.Console.PrintWarning("partial section from %i to %i\n"%(s0,s1))
-            loft = Part.makeLoft(wiribs[s0:s1+1],False,False,False,maxDegree)
-            surfaces += loft.Faces
-        #FreeCAD.Console.PrintWarning("final section from %i to %i\n"%(s1,st))
-        loft = Part.makeLoft(wiribs[s1:st+1],False,False,False,maxDegree)
+        futures = [pool.submit(func, *args) for args in tasks]
+        for index, future in enumerate(futures):
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except TimeoutError as ex:
+                ex.task = index
+                raise
+    except BaseException:
+        stopPool(pool, futures)
+        raise
+
+    pool.shutdown()
+    return results
+
+
+def shapeFromBrep(brep):
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    return shape
+
+
+def _loftWorker(brep, maxDegree):
+    wiribs = shapeFromBrep(brep).Wires
+    loft = Part.makeLoft(wiribs,False,False,False,maxDegree)
+    return loft.exportBrepToString()
+
+
+@RecomputeStats.timedPhase("loft")
+def makeLoftSurfaces(wiribs, maxDegree=5, maxLoftSize=16, parallel=False):
+    chunks = loftChunks(len(wiribs), maxLoftSize)
+    if parallel and len(chunks) > 1:
+        surfaces = makeLoftSurfacesParallel(wiribs, chunks, maxDegree)
+        if surfaces is not None:
+            return surfaces
+
+    surfaces = []
+    for first, last in chunks:
+        loft = Part.makeLoft(wiribs[first:last+1],False,False,False,maxDegree)
+        RecomputeStats.count("loft")
         surfaces += loft.Faces
-    except Exception as ex:      
-        FreeCAD.Console.PrintError(translate("Curved Shapes", "Creation of surface is not possible!") + "\n")
-        return Part.makeCompound(wiribs)
 
-    if solid:  
-        face1 = makeFace(ribs[0])
-        if face1:
-            surfaces.append(face1)
-        face2 = makeFace(ribs[len(ribs)-1])
-        if face2:
-            surfaces.append(face2)
+    return surfaces
+
+
+def makeLoftSurfacesParallel(wiribs, chunks, maxDegree=5):
+    """
+    Lofts the chunks in worker processes and returns the faces in the order of the chunks.
+    Returns None if no process pool is available or a worker crashed.
+    Raises RuntimeError if a chunk does not finish within workerTimeout() seconds.
+    """
+    from concurrent.futures import TimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+    pool = processPool(recomputeWorkers(len(chunks)))
+    if pool is None:
+        return None
+
+    try:
+        tasks = [(Part.makeCompound(wiribs[first:last+1]).exportBrepToString(), maxDegree) for first, last in chunks]
+        breps = poolMap(pool, _loftWorker, tasks)
+    except BrokenProcessPool:
+        FreeCAD.Console.PrintWarning(translate("Curved Shapes", "Parallel loft failed, lofting in a single process") + "\n")
+        return None
+    except TimeoutError as ex:
+        # lofting the hung chunk again in this process would hang FreeCAD
+        first, last = chunks[ex.task]
+        raise RuntimeError(translate("Curved Shapes", "Loft of the ribs {} to {} did not finish within {} s").format(first, last, workerTimeout()))
+
+    RecomputeStats.count("loft", len(chunks))
+    surfaces = []
+    for brep in breps:
+        surfaces += shapeFromBrep(brep).Faces
+
+    return surfaces
+
+
+def bsplineBasis(params, knots, degree):
+    """
+    Evaluates all B-spline basis functions of degree over the flat knot vector knots at params (Cox-de Boor).
+    Returns a numpy array (len(params), len(knots) - degree - 1)
+    """
+    params = np.asarray(params, dtype=float)
+    knots = np.asarray(knots, dtype=float)
+    spans = len(knots) - 1
+    basis = np.zeros((len(params), spans))
+    for j in range(spans):
+        basis[:, j] = (params >= knots[j]) & (params < knots[j + 1])
+
+    # the last parameter belongs to the last non-empty span
+    last = max([j for j in range(spans) if knots[j] < knots[j + 1]])
+    basis[params >= knots[last + 1], :] = 0
+    basis[params >= knots[last + 1], last] = 1
+
+    for d in range(1, degree + 1):
+        nextbasis = np.zeros((len(params), spans - d))
+        for j in range(spans - d):
+            left = knots[j + d] - knots[j]
+            right = knots[j + d + 1] - knots[j + 1]
+            if left > 0:
+                nextbasis[:, j] += (params - knots[j]) / left * basis[:, j]
+            if right > 0:
+                nextbasis[:, j] += (knots[j + d + 1] - params) / right * basis[:, j + 1]
+        basis = nextbasis
+
+    return basis
+
+
+def flatKnots(knots, mults):
+    flat = []
+    for k, m in zip(knots, mults):
+        flat += [k] * m
+    return flat
+
+
+def interpolationKnots(params, degree):
+    """Knots and multiplicities of a clamped B-spline interpolating at params (knot averaging)"""
+    n = len(params)
+    knots = [params[0]]
+    mults = [degree + 1]
+    for j in range(1, n - degree):
+        knots.append(sum(params[j:j + degree]) / degree)
+        mults.append(1)
+    knots.append(params[-1])
+    mults.append(degree + 1)
+    return knots, mults
+
+
+def approximationKnots(params, poles, degree):
+    """Knots and multiplicities of a clamped B-spline with poles poles fitted to points at params (The NURBS Book, eq. 9.69)"""
+    n = len(params)
+    d = n / (poles - degree)
+    knots = [params[0]]
+    mults = [degree + 1]
+    for j in range(1, poles - degree):
+        i = int(j * d)
+        alpha = j * d - i
+        knots.append((1 - alpha) * params[i - 1] + alpha * params[i])
+        mults.append(1)
+    knots.append(params[-1])
+    mults.append(degree + 1)
+    return knots, mults
+
+
+def chordParameters(points):
+    """
+    Returns the chord length parameters of the points (curves, count, 3), averaged over all curves,
+    so all curves can share one fit matrix. Uniform parameters if the curves have no length.
+    """
+    count = points.shape[1]
+    chords = np.linalg.norm(np.diff(points, axis=1), axis=2)
+    lengths = chords.sum(axis=1)
+    valid = lengths > epsilon
+    if not valid.any():
+        return np.linspace(0.0, 1.0, count)
+
+    params = np.zeros(count)
+    params[1:] = (np.cumsum(chords[valid], axis=1) / lengths[valid, None]).mean(axis=0)
+    params[-1] = 1.0
+    return params
+
+
+_fitMatrices = OrderedDict()
+
+def fitMatrix(params, poles, degree=3):
+    """
+    Returns knots, multiplicities, degree, the basis matrix (count, poles) and the matrix (poles, count) that maps
+    points at params to the poles of the least squares B-spline through them. The first and the last pole are
+    the end points, so the edges of a rib stay connected.
+    The least squares problem is solved only once per (params, poles, degree) and shared by all ribs.
+    """
+    count = len(params)
+    poles = max(2, min(poles, count))
+    degree = max(1, min(degree, poles - 1))
+    key = (tuple(np.round(params, 6)), poles, degree)
+    if key in _fitMatrices:
+        _fitMatrices.move_to_end(key)
+        return _fitMatrices[key]
+
+    if poles == count:
+        knots, mults = interpolationKnots(list(params), degree)
+    else:
+        knots, mults = approximationKnots(list(params), poles, degree)
+
+    basis = bsplineBasis(params, flatKnots(knots, mults), degree)
+    matrix = np.zeros((poles, count))
+    matrix[0, 0] = 1.0
+    matrix[-1, -1] = 1.0
+    if poles > 2:
+        # inner points minus the share of the fixed end poles
+        rhs = np.zeros((count - 2, count))
+        rhs[:, 1:-1] = np.eye(count - 2)
+        rhs[:, 0] = -basis[1:-1, 0]
+        rhs[:, -1] = -basis[1:-1, -1]
+        matrix[1:-1] = np.linalg.lstsq(basis[1:-1, 1:-1], rhs, rcond=None)[0]
+
+    fit = (knots, mults, degree, basis, matrix)
+    _fitMatrices[key] = fit
+    if len(_fitMatrices) > 64:
+        _fitMatrices.popitem(last=False)
+
+    return fit
+
+
+def fitCurves(points, degree=3, tolerance=1e-3):
+    """
+    Approximates each row of points, a numpy array (curves, count, 3), with a B-spline curve by least squares.
+    All curves share the chord length parameters, the knots and the fit matrix, so their poles come from one
+    matrix product. The number of poles starts at about a quarter of count and grows until every point is
+    within tolerance, like BSplineCurve.approximate(). Returns a list of Part.BSplineCurve
+    """
+    count = points.shape[1]
+    params = chordParameters(points)
+    poles = min(count, max(degree + 1, count // 4 + degree))
+    while True:
+        knots, mults, fitDegree, basis, matrix = fitMatrix(params, poles, degree)
+        fitted = np.einsum('pq,rqk->rpk', matrix, points)
+        error = np.linalg.norm(np.einsum('qp,rpk->rqk', basis, fitted) - points, axis=2).max()
+        if error <= tolerance or poles >= count:
+            break
+        poles = min(count, 2 * poles - fitDegree)
+
+    curves = []
+    for p in fitted:
+        curve = Part.BSplineCurve()
+        curve.buildFromPolesMultsKnots(toVectors(p), mults, knots, False, fitDegree)
+        curves.append(curve)
+
+    return curves
+
+
+def ribCurves(rib):
+    """Returns the B-spline curves of all edges of a rib"""
+    curves = []
+    for edge in rib.Edges:
+        curve = edge.Curve
+        if not isinstance(curve, Part.BSplineCurve) or abs(curve.FirstParameter - edge.FirstParameter) > epsilon or abs(curve.LastParameter - edge.LastParameter) > epsilon:
+            curve = curve.toBSpline(edge.FirstParameter, edge.LastParameter)
+        curves.append(curve)
+
+    return curves
+
+
+def compatibleCurves(curve1, curve2):
+    return curve1.Degree == curve2.Degree \
+        and curve1.NbPoles == curve2.NbPoles \
+        and curve1.isPeriodic() == curve2.isPeriodic() \
+        and curve1.getMultiplicities() == curve2.getMultiplicities() \
+        and np.allclose(curve1.getKnots(), curve2.getKnots(), atol=epsilon)
+
+
+def normalizedCurve(curve):
+    """Returns a non periodic copy of curve with the parameter range 0 to 1"""
+    if curve.isPeriodic():
+        curve = curve.copy()
+        curve.setNotPeriodic()
+
+    knots = curve.getKnots()
+    span = knots[-1] - knots[0]
+    normalized = Part.BSplineCurve()
+    normalized.buildFromPolesMultsKnots(curve.getPoles(), 
+                                        curve.getMultiplicities(), 
+                                        [(k - knots[0]) / span for k in knots], 
+                                        False, 
+                                        curve.Degree,
+                                        curve.getWeights(), 
+                                        curve.isRational())
+    return normalized
+
+
+def makeCompatible(curve1, curve2):
+    """
+    Returns copies of both curves with the same degree, knots and multiplicities by degree elevation and knot insertion,
+    or None if this is not possible (e.g. rational curves with different weights).
+    """
+    c1 = normalizedCurve(curve1)
+    c2 = normalizedCurve(curve2)
+    degree = max(c1.Degree, c2.Degree)
+    c1.increaseDegree(degree)
+    c2.increaseDegree(degree)
+
+    knots1 = list(zip(c1.getKnots(), c1.getMultiplicities()))
+    knots2 = list(zip(c2.getKnots(), c2.getMultiplicities()))
+    for curve, knots, other in ((c1, knots1, knots2), (c2, knots2, knots1)):
+        for k, m in other:
+            current = 0
+            for kc, mc in knots:
+                if abs(kc - k) < epsilon:
+                    current = mc
+                    break
+
+            if m > current:
+                curve.insertKnot(k, m - current, epsilon)
+
+    if not compatibleCurves(c1, c2):
+        return None
+    if not np.allclose(c1.getWeights(), c2.getWeights()):
+        return None
+
+    return c1, c2
+
+
+def splitCurves(edges, pieces):
+    """Returns the B-spline curves of the edges, each split into pieces of equal length"""
+    curves = []
+    for edge in edges:
+        params = [edge.getParameterByLength(edge.Length * i / pieces) for i in range(0, pieces + 1)]
+        for i in range(0, pieces):
+            curves.append(edge.Curve.toBSpline(params[i], params[i + 1]))
+
+    return curves
+
+
+_profilePairs = OrderedDict()
+
+def compatibleProfiles(profile1, profile2, twistReverse=False, maxEdges=64):
+    """
+    Makes the edges of two profiles B-spline compatible, so the ribs between them can be interpolated pole by pole.
+    Profiles with a different number of edges are split to a common number of edges (at most maxEdges).
+    Returns a list of (curve1, curve2) pairs or None. The result is cached per profile pair.
+    """
+    key = (ShapeCache.linkFingerprint(profile1), ShapeCache.linkFingerprint(profile2), twistReverse, maxEdges)
+    if key in _profilePairs:
+        _profilePairs.move_to_end(key)
+        return _profilePairs[key]
+
+    edges1 = profile1.Shape.Edges
+    edges2 = profile2.Shape.Edges
+    len1 = len(edges1)
+    len2 = len(edges2)
+    pairs = None
+    if len1 > 0 and len2 > 0:
+        if len1 == len2:
+            curves1 = [e.Curve.toBSpline(e.FirstParameter, e.LastParameter) for e in edges1]
+            curves2 = [e.Curve.toBSpline(e.FirstParameter, e.LastParameter) for e in edges2]
+        else:
+            nr_edges = len1 * len2 // math.gcd(len1, len2)
+            if nr_edges <= maxEdges:
+                curves1 = splitCurves(sum(Part.sortEdges(edges1), []), nr_edges // len1)
+                curves2 = splitCurves(sum(Part.sortEdges(edges2), []), nr_edges // len2)
+            else:
+                curves1 = curves2 = []
+
+        if twistReverse:
+            curves2.reverse()
+
+        if len(curves1) > 0:
+            pairs = []
+            for c1, c2 in zip(curves1, curves2):
+                if compatibleCurves(c1, c2):
+                    pairs.append((c1, c2))
+                    continue
 
-        try:
-            shell = Part.makeShell(surfaces)
-            if face1 and face2:
                 try:
-                    return Part.makeSolid(shell)
+                    pair = makeCompatible(c1, c2)
                 except Exception as ex:
-                    FreeCAD.Console.PrintError(translate("Curved Shapes", "Creating solid failed!") + "\n")
+                    pair = None
+
+                if pair is None:
+                    pairs = None
+                    break
+                pairs.append(pair)
+
+    _profilePairs[key] = pairs
+    if len(_profilePairs) > 32:
+        _profilePairs.popitem(last=False)
+
+    return pairs
 
+
+@RecomputeStats.timedPhase("loft")
+def makeDirectSurfaces(ribs, maxDegree=5):
+    """
+    Builds a B-spline surface through all ribs for each edge of the ribs, without lofting.
+    All ribs must have the same number of edges and each edge must have the same degree, knots and multiplicities in every rib.
+    The pole rows of the ribs are interpolated in rib direction with one linear solve.
+    Returns a list of faces or None if the ribs are not compatible.
+    """
+    if len(ribs) < 2:
+        return None
+
+    try:
+        curves = [ribCurves(r) for r in ribs]
+    except Exception as ex:
+        return None
+
+    nedges = len(curves[0])
+    if nedges == 0:
+        return None
+    for c in curves[1:]:
+        if len(c) != nedges:
+            return None
+        for e in range(nedges):
+            if not compatibleCurves(curves[0][e], c[e]):
+                return None
+
+    nribs = len(ribs)
+    degree = max(1, min(maxDegree, nribs - 1))
+
+    # homogeneous poles (ribs, edges) -> array (poles, 4)
+    hpoles = []
+    for r in range(nribs):
+        row = []
+        for e in range(nedges):
+            poles = toArray(curves[r][e].getPoles())
+            weights = np.array(curves[r][e].getWeights(), dtype=float)[:, None]
+            row.append(np.hstack((poles * weights, weights)))
+        hpoles.append(row)
+
+    # chord length parameters across the ribs
+    dist = [0.0]
+    for r in range(1, nribs):
+        d = 0
+        for e in range(nedges):
+            d += np.linalg.norm(hpoles[r][e][:, :3] / hpoles[r][e][:, 3:] - hpoles[r-1][e][:, :3] / hpoles[r-1][e][:, 3:], axis=1).mean()
+        dist.append(dist[-1] + d)
+    if dist[-1] < epsilon:
+        params = [r / (nribs - 1) for r in range(nribs)]
+    else:
+        params = [d / dist[-1] for d in dist]
+
+    vknots, vmults = interpolationKnots(params, degree)
+    basis = bsplineBasis(params, flatKnots(vknots, vmults), degree)
+    try:
+        solved = [np.linalg.solve(basis, np.array([hpoles[r][e] for r in range(nribs)]).reshape(nribs, -1)) for e in range(nedges)]
+    except np.linalg.LinAlgError:
+        return None
+
+    faces = []
+    for e in range(nedges):
+        curve = curves[0][e]
+        hp = solved[e].reshape(nribs, curve.NbPoles, 4)
+        weights = hp[:, :, 3]
+        if np.any(weights <= epsilon):
+            return None
+
+        poles = hp[:, :, :3] / weights[:, :, None]
+        surface = Part.BSplineSurface()
+        surface.buildFromPolesMultsKnots([toVectors(poles[:, u, :]) for u in range(curve.NbPoles)],
+                                         curve.getMultiplicities(),
+                                         vmults,
+                                         curve.getKnots(),
+                                         vknots,
+                                         curve.isPeriodic(),
+                                         False,
+                                         curve.Degree,
+                                         degree,
+                                         [[float(w) for w in weights[:, u]] for u in range(curve.NbPoles)])
+        faces.append(surface.toShape())
+
+    if len(faces) > 1:
+        try:
+            shell = Part.makeShell(faces)
+            shell.sewShape()
+            faces = shell.Faces
         except Exception as ex:
-            FreeCAD.Console.PrintError(translate("Curved Shapes", "Creating shell failed!") + "\n")
+            pass
+
+    return faces
+
+
+def makeSurfaceSolid(ribs, solid, maxDegree=5, maxLoftSize=16, surfaceMode='Loft', parallel=False, cacheKey=None):
+    """
+    Makes the surface over the ribs, closed by the first and last rib if solid is True.
+    If cacheKey is the ShapeCache key of the ribs, the faces are reused if only solid changed.
+    """
+    surfaces = None
+    direct = surfaceMode == 'Direct'
+    if cacheKey:
+        surfaceKey = ShapeCache.subKey(cacheKey, maxDegree, maxLoftSize, surfaceMode)
+        surfaces = ShapeCache.lookupShapes(surfaceKey)
+
+    if surfaces is None:
+        wiribs = ribWires(ribs)
+        if wiribs is None:
+            return
+
+        if direct:
+            try:
+                surfaces = makeDirectSurfaces(ribs, maxDegree)
+            except Exception as ex:
+                surfaces = None
+
+        if not surfaces:
+            try:
+                surfaces = makeLoftSurfaces(wiribs, maxDegree, maxLoftSize, parallel)
+            except Exception as ex:      
+                FreeCAD.Console.PrintError(translate("Curved Shapes", "Creation of surface is not possible!") + "\n")
+                return Part.makeCompound(wiribs)
+
+        if cacheKey:
+            ShapeCache.storeShapes(surfaceKey, surfaces)
+
+    if solid:  
+        closed = closeSurfaces(ribs, surfaces, direct)
+        if closed is not None:
+            return closed
 
     if len(surfaces) == 1:
         return surfaces[0]
@@ -261,6 +1089,32 @@ def makeSurfaceSolid(ribs, solid, maxDegree=5, maxLoftSize=16):
         return Part.makeCompound(surfaces) 
 
 
+@RecomputeStats.timedPhase("solid")
+def closeSurfaces(ribs, surfaces, sew=False):
+    """Adds the faces of the first and the last rib to surfaces and returns the solid, or None"""
+    face1 = makeFace(ribs[0])
+    if face1:
+        surfaces.append(face1)
+    face2 = makeFace(ribs[len(ribs)-1])
+    if face2:
+        surfaces.append(face2)
+
+    try:
+        shell = Part.makeShell(surfaces)
+        if sew:
+            shell.sewShape()
+        if face1 and face2:
+            try:
+                return Part.makeSolid(shell)
+            except Exception as ex:
+                FreeCAD.Console.PrintError(translate("Curved Shapes", "Creating solid failed!") + "\n")
+
+    except Exception as ex:
+        FreeCAD.Console.PrintError(translate("Curved Shapes", "Creating shell failed!") + "\n")
+
+    return None
+
+
 def makeFace(rib):
     if len(rib.Wires) == 1:
         wire = rib.Wires[0]
@@ -290,6 +1144,36 @@ def getNormal(obj):
         return obj.Placement.Rotation.multVec(Vector(0, 0, 1))
 
 
+def boundBoxExtent(bbox, normal):
+    """Returns (min, max) of the distances of the corners of bbox from the origin along normal"""
+    n = Vector(normal).normalize()
+    center = bbox.Center.dot(n)
+    radius = (abs(n.x) * bbox.XLength + abs(n.y) * bbox.YLength + abs(n.z) * bbox.ZLength) / 2
+    return center - radius, center + radius
+
+
+class BoundBoxIndex:
+    """
+    Finds the boxes that overlap a box (sweep and prune): the boxes are sorted by XMin,
+    a binary search skips all boxes that start behind the query box, the rest is tested with numpy.
+    """
+    def __init__(self, boxes, tolerance=epsilon):
+        order = sorted(range(len(boxes)), key=lambda i: boxes[i].XMin)
+        self.order = np.array(order, dtype=int)
+        self.mins = np.array([[boxes[i].XMin, boxes[i].YMin, boxes[i].ZMin] for i in order], dtype=float).reshape(-1, 3)
+        self.maxs = np.array([[boxes[i].XMax, boxes[i].YMax, boxes[i].ZMax] for i in order], dtype=float).reshape(-1, 3)
+        self.tolerance = tolerance
+
+
+    def overlapping(self, box):
+        """Returns the indices of the boxes that overlap or touch box, in ascending order"""
+        end = np.searchsorted(self.mins[:, 0], box.XMax + self.tolerance, side='right')
+        low = np.array([box.XMin, box.YMin, box.ZMin]) - self.tolerance
+        high = np.array([box.XMax, box.YMax, box.ZMax]) + self.tolerance
+        hits = np.all(self.mins[:end] <= high, axis=1) & np.all(self.maxs[:end] >= low, axis=1)
+        return sorted(self.order[:end][hits].tolist())
+
+
 def vectorMiddle(vec1, vec2, fraction):
     x = vec1.x + (vec2.x - vec1.x) * fraction
     y = vec1.y + (vec2.y - vec1.y) * fraction
@@ -297,6 +1181,175 @@ def vectorMiddle(vec1, vec2, fraction):
     return Vector(x,y,z)
 
 
+class PathSampler:
+    """
+    Arc length table of a path made of several edges.
+    Finds the edge of a station by a binary search in the cumulative edge lengths
+    instead of walking along the edges for each station.
+    """
+    def __init__(self, edges):
+        self.Edges = Part.__sortEdges__(edges)
+        self.starts = np.concatenate(([0.0], np.cumsum([e.Length for e in self.Edges])))
+        self.Length = float(self.starts[-1])
+
+
+    def locate(self, lengths):
+        """
+        Returns the index of the edge and the length on that edge for each arc length.
+        A length at the end of an edge belongs to that edge, lengths beyond the end of the path get index -1.
+        """
+        lengths = np.asarray(lengths, dtype=float)
+        idx = np.clip(np.searchsorted(self.starts, lengths, side='left') - 1, 0, len(self.Edges) - 1)
+        local = lengths - self.starts[idx]
+        edgelen = self.starts[idx + 1] - self.starts[idx]
+        beyond = local > edgelen + epsilon
+        local = np.minimum(local, edgelen)
+        idx[beyond] = -1
+        return idx, local
+
+
+    def sample(self, lengths):
+        """
+        Returns the positions and tangents at the arc lengths as lists of Vectors.
+        Both are None for lengths beyond the end of the path.
+        """
+        points = []
+        tangents = []
+        idx, local = self.locate(lengths)
+        for i, plen in zip(idx, local):
+            if i < 0:
+                points.append(None)
+                tangents.append(None)
+                continue
+
+            edge = self.Edges[i]
+            param = edge.getParameterByLength(float(plen))
+            points.append(edge.valueAt(param))
+            tangents.append(edge.tangentAt(param))
+
+        return points, tangents
+
+
+_pathSamplers = OrderedDict()
+
+def pathSampler(path):
+    """Returns the PathSampler of a linked path object, shared by all features using the same path geometry"""
+    key = ShapeCache.linkFingerprint(path)
+    sampler = _pathSamplers.get(key)
+    if sampler is None:
+        sampler = PathSampler(path.Shape.Edges)
+        _pathSamplers[key] = sampler
+        if len(_pathSamplers) > 32:
+            _pathSamplers.popitem(last=False)
+    else:
+        _pathSamplers.move_to_end(key)
+
+    return sampler
+
+
+def alignRotation(normal, direction):
+    """Returns the shortest rotation that turns normal onto direction"""
+    rotaxis = normal.cross(direction)
+    if rotaxis.Length > epsilon:
+        return FreeCAD.Rotation(rotaxis, math.degrees(normal.getAngle(direction)))
+    return FreeCAD.Rotation()
+
+
+def rotationMinimizingFrames(points, tangents, reference):
+    """
+    Carries the reference vector along the stations with the double reflection method
+    (Wang, Jüttler, Zheng, Liu: Computation of Rotation Minimizing Frames, 2008).
+    Returns an (n, 3) array of unit vectors perpendicular to the tangents.
+    """
+    x = toArray(points)
+    t = toArray(tangents)
+    t /= np.linalg.norm(t, axis=1)[:, None]
+    r = np.empty_like(t)
+    r0 = np.array(tuple(reference), dtype=float)
+    r0 -= np.dot(r0, t[0]) * t[0]
+    r[0] = r0 / np.linalg.norm(r0)
+    for i in range(0, len(t) - 1):
+        ri = r[i]
+        ti = t[i]
+        v1 = x[i+1] - x[i]
+        c1 = np.dot(v1, v1)
+        if c1 > epsilon:
+            ri = ri - (2 / c1) * np.dot(v1, ri) * v1
+            ti = ti - (2 / c1) * np.dot(v1, ti) * v1
+
+        v2 = t[i+1] - ti
+        c2 = np.dot(v2, v2)
+        if c2 > epsilon:
+            ri = ri - (2 / c2) * np.dot(v2, ri) * v2
+
+        ri = ri - np.dot(ri, t[i+1]) * t[i+1]
+        r[i+1] = ri / np.linalg.norm(ri)
+
+    return r
+
+
+def pathRotations(normals, points, tangents, frameMode='Tangent'):
+    """
+    Returns the rotation for each station that turns a rib with the normal onto the path tangent.
+    Tangent: each rib is turned the shortest way, so ribs roll around the path on inflecting paths.
+    RotationMinimizing: the ribs keep the roll of the first rib along the path.
+    """
+    rotations = [alignRotation(normals[i], tangents[i]) for i in range(0, len(tangents))]
+    if frameMode != 'RotationMinimizing' or len(rotations) < 2:
+        return rotations
+
+    # a direction in the plane of the first rib, carried to the following ribs
+    n0 = normals[0]
+    side = n0.cross(Vector(0,0,1))
+    if side.Length < 0.1:
+        side = n0.cross(Vector(1,0,0))
+    side.normalize()
+
+    frames = rotationMinimizingFrames(points, tangents, rotations[0].multVec(side))
+    for i in range(1, len(rotations)):
+        tangent = Vector(tangents[i]).normalize()
+        ribside = rotations[i].multVec(alignRotation(n0, normals[i]).multVec(side))
+        frame = Vector(*frames[i])
+        angle = math.atan2(ribside.cross(frame).dot(tangent), ribside.dot(frame))
+        rotations[i] = FreeCAD.Rotation(tangent, math.degrees(angle)).multiply(rotations[i])
+
+    return rotations
+
+
+def adaptiveStations(evaluate, tolerance, initial=5, maxDepth=8):
+    """
+    Returns sorted stations from 0.0 to 1.0 for ribs, so that the ribs follow the shape within tolerance.
+    Starts with initial equally spaced stations and bisects each interval whose midpoint deviates
+    from the linear interpolation of the interval ends by more than tolerance.
+    evaluate(stations) returns a numpy vector (or None if there is no rib) for each station,
+    it is called once per refinement level for all new stations.
+    """
+    stations = [i / (initial - 1) for i in range(0, initial)]
+    values = dict(zip(stations, evaluate(stations)))
+    intervals = list(zip(stations[:-1], stations[1:]))
+    for depth in range(0, maxDepth):
+        if len(intervals) == 0:
+            break
+
+        mids = [(a + b) / 2 for a, b in intervals]
+        refine = []
+        for (a, b), m, v in zip(intervals, mids, evaluate(mids)):
+            va = values[a]
+            vb = values[b]
+            if v is None or va is None or vb is None:
+                deviates = not (v is None and va is None and vb is None)
+            else:
+                deviates = np.max(np.abs(v - (va + vb) / 2)) > tolerance
+
+            if deviates:
+                values[m] = v
+                refine += [(a, m), (m, b)]
+
+        intervals = refine
+
+    return sorted(values)
+
+
 # x is in range 0 to 1. result mut be in range 0 to 1.
 def distribute(x, distribution, reverse = False): 
     d = x   # default = 'linear'
@@ -338,10 +1391,13 @@ def makeCurvedArray(Base = None,
                     Twists = [],
                     LoftMaxDegree=5,
                     MaxLoftSize=16,
-                    KeepBase='None'):
+                    KeepBase='None',
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    AdaptiveTolerance=0.0):
     import CurvedArray
     obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython","CurvedArray")
-    CurvedArray.CurvedArray(obj, Base, Hullcurves, Axis, Items, Position, OffsetStart, OffsetEnd, Twist, Surface, Solid, Distribution, DistributionReverse, False, Twists, LoftMaxDegree, MaxLoftSize, KeepBase)
+    CurvedArray.CurvedArray(obj, Base, Hullcurves, Axis, Items, Position, OffsetStart, OffsetEnd, Twist, Surface, Solid, Distribution, DistributionReverse, False, Twists, LoftMaxDegree, MaxLoftSize, KeepBase, SurfaceMode, ParallelLoft, AdaptiveTolerance)
     if FreeCAD.GuiUp:
         CurvedArray.CurvedArrayViewProvider(obj.ViewObject)
     FreeCAD.ActiveDocument.recompute()
@@ -349,7 +1405,8 @@ def makeCurvedArray(Base = None,
         return obj
 
     bang = CompoundTools.Explode.explodeCompound(obj)
-    obj.ViewObject.hide()
+    if obj.ViewObject:
+        obj.ViewObject.hide()
     return bang[1]
 
 
@@ -365,10 +1422,13 @@ def makeCurvedPathArray(Base = None,
                     doScale = [True, True, True],
                     extract=False,
                     LoftMaxDegree=5,
-                    MaxLoftSize=16):
+                    MaxLoftSize=16,
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    FrameMode='Tangent'):
     import CurvedPathArray
     obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython","CurvedPathArray")
-    CurvedPathArray.CurvedPathArray(obj, Base, Path, Hullcurves, Items, OffsetStart, OffsetEnd, Twist, Surface, Solid, doScale, extract, LoftMaxDegree, MaxLoftSize)
+    CurvedPathArray.CurvedPathArray(obj, Base, Path, Hullcurves, Items, OffsetStart, OffsetEnd, Twist, Surface, Solid, doScale, extract, LoftMaxDegree, MaxLoftSize, SurfaceMode, ParallelLoft, FrameMode)
     if FreeCAD.GuiUp:
         CurvedPathArray.CurvedPathArrayViewProvider(obj.ViewObject)
     FreeCAD.ActiveDocument.recompute()
@@ -391,10 +1451,15 @@ def makeCurvedSegment(Shape1 = None,
                     LoftMaxDegree=5,
                     MaxLoftSize=16,
                     Path = None,
-                    ForceInterpolated=False):
+                    ForceInterpolated=False,
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    FrameMode='Tangent',
+                    Positions=[],
+                    AdaptiveTolerance=0.0):
     import CurvedSegment
     obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython","CurvedSegment")
-    CurvedSegment.CurvedSegment(obj, Shape1, Shape2, Hullcurves, NormalShape1, NormalShape2, Items, Surface, Solid, InterpolationPoints, Twist, TwistReverse, Distribution, DistributionReverse, LoftMaxDegree, MaxLoftSize, Path, ForceInterpolated)
+    CurvedSegment.CurvedSegment(obj, Shape1, Shape2, Hullcurves, NormalShape1, NormalShape2, Items, Surface, Solid, InterpolationPoints, Twist, TwistReverse, Distribution, DistributionReverse, LoftMaxDegree, MaxLoftSize, Path, ForceInterpolated, SurfaceMode, ParallelLoft, FrameMode, Positions, AdaptiveTolerance)
     if FreeCAD.GuiUp:
         CurvedSegment.CurvedSegmentViewProvider(obj.ViewObject)
     FreeCAD.ActiveDocument.recompute()
@@ -431,11 +1496,145 @@ def cutSurfaces(Surfaces=[], Normal = Vector(1, 0, 0), Position=Vector(0,0,0), F
     return obj
 
 
-def makeNotchConnector(Base, Tools, CutDirection=Vector(0,0,0), CutDepth=50.0, ShiftLength=0):
+def makeSurfaceCutStack(Surfaces=[], Normal = Vector(1, 0, 0), Position=Vector(0,0,0), Offsets=[], Count=0, Face=False, Simplify=0, extract=False):
+    import SurfaceCutStack
+    obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython","SurfaceCutStack")
+    SurfaceCutStack.SurfaceCutStack(obj, Surfaces, Normal, Position, Offsets, Count, Face, Simplify)
+    if FreeCAD.GuiUp:
+        SurfaceCutStack.SurfaceCutStackViewProvider(obj.ViewObject)
+    FreeCAD.ActiveDocument.recompute()
+    if not extract:     
+        return obj
+
+    bang = CompoundTools.Explode.explodeCompound(obj)
+    if obj.ViewObject:
+        obj.ViewObject.hide()
+    return bang[1]
+
+
+def makeNotchConnector(Base, Tools, CutDirection=Vector(0,0,0), CutDepth=50.0, ShiftLength=0, Parallel=False):
     import NotchConnector
     obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython","NotchConnector")
-    NotchConnector.NotchConnector(obj, Base, Tools, CutDirection, CutDepth, ShiftLength)
+    NotchConnector.NotchConnector(obj, Base, Tools, CutDirection, CutDepth, ShiftLength, Parallel)
     if FreeCAD.GuiUp:
         NotchConnector.NotchConnectorViewProvider(obj.ViewObject)
     FreeCAD.ActiveDocument.recompute()
     return obj
+
+
+# Build functions: the same as the make functions, but without a document.
+# The inputs are Part.Shapes (or document objects), the result is a Part.Shape.
+
+def buildCurvedArray(Base, 
+                    Hullcurves=[], 
+                    Axis=Vector(0,0,0), 
+                    Items=2,
+                    Positions=[],
+                    OffsetStart=0, 
+                    OffsetEnd=0, 
+                    Twist=0, 
+                    Surface=False, 
+                    Solid=False, 
+                    Distribution = 'linear',
+                    DistributionReverse = False,
+                    Twists = [],
+                    LoftMaxDegree=5,
+                    MaxLoftSize=16,
+                    KeepBase='None',
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    AdaptiveTolerance=0.0):
+    import CurvedArray
+    fp = FeatureParameters()
+    Base = snapshot(Base)
+    if Axis == Vector(0,0,0):
+        Axis = getNormal(Base)
+    CurvedArray.CurvedArray(fp, Base, Hullcurves, Axis, Items, Positions, OffsetStart, OffsetEnd, Twist, Surface, Solid, Distribution, DistributionReverse, False, Twists, LoftMaxDegree, MaxLoftSize, KeepBase, SurfaceMode, ParallelLoft, AdaptiveTolerance)
+    return fp.recompute()
+
+
+def buildCurvedPathArray(Base, 
+                    Path,
+                    Hullcurves=[], 
+                    Items=2, 
+                    OffsetStart=0, 
+                    OffsetEnd=0, 
+                    Twist=0, 
+                    Surface=False, 
+                    Solid=False, 
+                    doScale = [True, True, True],
+                    LoftMaxDegree=5,
+                    MaxLoftSize=16,
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    FrameMode='Tangent'):
+    import CurvedPathArray
+    fp = FeatureParameters()
+    CurvedPathArray.CurvedPathArray(fp, Base, Path, Hullcurves, Items, OffsetStart, OffsetEnd, Twist, Surface, Solid, doScale, False, LoftMaxDegree, MaxLoftSize, SurfaceMode, ParallelLoft, FrameMode)
+    return fp.recompute()
+
+
+def buildCurvedSegment(Shape1, 
+                    Shape2, 
+                    Hullcurves=[], 
+                    NormalShape1=Vector(0,0,0), 
+                    NormalShape2=Vector(0,0,0), 
+                    Items=2, 
+                    Surface=False, 
+                    Solid=False,
+                    InterpolationPoints=16,
+                    Twist = 0.0,
+                    TwistReverse = False,
+                    Distribution = 'linear',
+                    DistributionReverse = False,
+                    LoftMaxDegree=5,
+                    MaxLoftSize=16,
+                    Path = None,
+                    ForceInterpolated=False,
+                    SurfaceMode='Loft',
+                    ParallelLoft=False,
+                    FrameMode='Tangent',
+                    Positions=[],
+                    AdaptiveTolerance=0.0):
+    import CurvedSegment
+    fp = FeatureParameters()
+    CurvedSegment.CurvedSegment(fp, Shape1, Shape2, Hullcurves, NormalShape1, NormalShape2, Items, Surface, Solid, InterpolationPoints, Twist, TwistReverse, Distribution, DistributionReverse, LoftMaxDegree, MaxLoftSize, Path, ForceInterpolated, SurfaceMode, ParallelLoft, FrameMode, Positions, AdaptiveTolerance)
+    return fp.recompute()
+
+
+def buildInterpolatedMiddle(Shape1, 
+                    Shape2, 
+                    NormalShape1=Vector(0,0,0), 
+                    NormalShape2=Vector(0,0,0), 
+                    Surface=False, 
+                    Solid=False,
+                    InterpolationPoints=16,
+                    Twist = 0.0,
+                    TwistReverse = False,
+                    LoftMaxDegree=5,
+                    MaxLoftSize=16):
+    import InterpolatedMiddle
+    fp = FeatureParameters()
+    InterpolatedMiddle.InterpolatedMiddle(fp, Shape1, Shape2, NormalShape1, NormalShape2, Surface, Solid, InterpolationPoints, Twist, TwistReverse, LoftMaxDegree, MaxLoftSize)
+    return fp.recompute()
+
+
+def buildSurfaceCut(Surfaces, Normal = Vector(1, 0, 0), Position=Vector(0,0,0), Face=False, Simplify=0):
+    import SurfaceCut
+    fp = FeatureParameters()
+    SurfaceCut.SurfaceCut(fp, Surfaces, Normal, Position, Face, Simplify)
+    return fp.recompute()
+
+
+def buildSurfaceCutStack(Surfaces, Normal = Vector(1, 0, 0), Position=Vector(0,0,0), Offsets=[], Count=0, Face=False, Simplify=0):
+    import SurfaceCutStack
+    fp = FeatureParameters()
+    SurfaceCutStack.SurfaceCutStack(fp, Surfaces, Normal, Position, Offsets, Count, Face, Simplify)
+    return fp.recompute()
+
+
+def buildNotchConnector(Base, Tools, CutDirection=Vector(0,0,0), CutDepth=50.0, ShiftLength=0, Parallel=False):
+    import NotchConnector
+    fp = FeatureParameters()
+    NotchConnector.NotchConnector(fp, Base, Tools, CutDirection, CutDepth, ShiftLength, Parallel)
+    return fp.recompute()
@@ -1,74 +1,73 @@
 from FreeCAD import Vector, Rotation, Placement
 import FreeCAD
+if FreeCAD.GuiUp:
+    import FreeCADGui
 import Sketcher
 import Part
 import Draft
 import BOPTools.SplitFeatures
 import CompoundTools.Explode
 import math
-import FreeCADGui
 import CurvedShapes
 from PySide.QtCore import QT_TRANSLATE_NOOP
 
 translate = FreeCAD.Qt.translate
 
-def draw_S800():
-    sweep_offset = 210
-    wing_span = 820
-    midWidth = 150
-    midLength = 200
-
-    WingInside_height_top = 25
-    WingInside_height_bot =  5
-    WingInside_length = 260
-
-    WingOutside_height_top = 20
-    WingOutside_height_bot = 3
-    WingOutside_length = 165
-
-    Middle_height_top = 40
-    Middle_height_bot = 20
+def draw_S800(sweep_offset = 210,
+              wing_span = 820,
+              midWidth = 150,
+              midLength = 200,
+              WingInside_height_top = 25,
+              WingInside_height_bot = 5,
+              WingInside_length = 260,
+              WingOutside_height_top = 20,
+              WingOutside_height_bot = 3,
+              WingOutside_length = 165,
+              Middle_height_top = 40,
+              Middle_height_bot = 20,
+              WingletTop_height_top = 3,
+              WingletTop_height_bot = 3,
+              Winglet_angle_y = 10,
+              ElevonThickness = 1,
+              ElevonLeftAngle = 20,
+              ElevonRightAngle = -20,
+              ItemsFactor = 1,
+              DocumentName = "S800"):
+    """Draws the S800 into a new document and returns the document. The parameters allow variants for design studies."""
     Middle_length = WingInside_length
-
-    WingletTop_height_top = 3
-    WingletTop_height_bot = 3
-    Winglet_angle_y = 10
     WingletBottom_height_top = WingletTop_height_top
     WingletBottom_height_bot = WingletTop_height_bot
     WingletBottom_length = WingOutside_length
+    Items = max(2, round(8 * ItemsFactor))
 
-    ElevonThickness = 1
-    ElevonLeftAngle = 20
-    ElevonRightAngle = -20
-
-    if FreeCAD.ActiveDocument is not None and FreeCAD.ActiveDocument.Name == "S800":
+    if FreeCAD.ActiveDocument is not None and FreeCAD.ActiveDocument.Name == DocumentName:
         FreeCAD.closeDocument(FreeCAD.ActiveDocument.Name)
         FreeCAD.setActiveDocument("")
         FreeCAD.ActiveDocument=None
 
-    doc = FreeCAD.newDocument('S800')
+    doc = FreeCAD.newDocument(DocumentName)
     
     SplineFoilWingInside = doc.addObject('Sketcher::SketchObject', 'SplineFoilWingInside')
     makeSplineFoilSketch(SplineFoilWingInside, WingInside_length, WingInside_height_top, WingInside_height_bot, ElevonThickness)
-    SplineFoilWingInside.ViewObject.Visibility = False
+    SplineFoilWingInside.Visibility = False
     SplineFoilWingInside.Placement = Placement(Vector (midWidth / 2, 0.0, 1.0), Rotation (0.5, 0.5, 0.5, 0.5))
-    SplineFoilWingInside.ViewObject.Visibility = False
+    SplineFoilWingInside.Visibility = False
 
     SplineFoilWingOutside = doc.addObject('Sketcher::SketchObject', 'SplineFoilWingOutside')
     makeSplineFoilSketch(SplineFoilWingOutside, WingOutside_length, WingOutside_height_top, WingOutside_height_bot, ElevonThickness)
-    SplineFoilWingOutside.ViewObject.Visibility = False
+    SplineFoilWingOutside.Visibility = False
     SplineFoilWingOutside.Placement = Placement(Vector (wing_span / 2, sweep_offset, 1.0), Rotation (0.5, 0.5, 0.5, 0.5))
-    SplineFoilWingOutside.ViewObject.Visibility = False
+    SplineFoilWingOutside.Visibility = False
 
     SplineFoilWingletBottom = doc.addObject('Sketcher::SketchObject', 'SplineFoilWingletBottom')
     makeSplineFoilSketch(SplineFoilWingletBottom, WingletBottom_length, WingletBottom_height_top, WingletBottom_height_bot, 0.5)
-    SplineFoilWingletBottom.ViewObject.Visibility = False
+    SplineFoilWingletBottom.Visibility = False
     SplineFoilWingletBottom.Placement.Rotation.Axis = Vector (0.0, 0.0, 0.1)
     SplineFoilWingletBottom.Placement.Rotation.Angle = math.radians(90)
     SplineFoilWingletBottom.Placement.Base.y = sweep_offset
     SplineFoilWingletBottom.Placement.Base.x = wing_span / 2 + WingletTop_height_bot *1.5 
     SplineFoilWingletBottom.Placement.Base.z = WingOutside_height_top
-    SplineFoilWingletBottom.ViewObject.Visibility = False
+    SplineFoilWingletBottom.Visibility = False
 
     doc.recompute()
     Draft.rotate([SplineFoilWingletBottom], Winglet_angle_y, SplineFoilWingletBottom.Placement.Base, Vector(0, 1, 0), copy=False)
@@ -77,14 +76,14 @@ def draw_S800():
     SplineFoilMiddle = doc.addObject('Sketcher::SketchObject', 'SplineFoilMiddle')
     makeSplineFoilSketch(SplineFoilMiddle, Middle_length, Middle_height_top, Middle_height_bot, ElevonThickness)
     SplineFoilMiddle.Placement = Placement(Vector (0.0, 0.0, 0.0), Rotation (0.5, 0.5, 0.5, 0.5))
-    SplineFoilMiddle.ViewObject.Visibility = False
+    SplineFoilMiddle.Visibility = False
 
     MiddleProfile = createSketch_MiddleProfile(doc)
-    MiddleProfile.ViewObject.Visibility = False
+    MiddleProfile.Visibility = False
 
-    MiddlePart1 = CurvedShapes.makeCurvedSegment(SplineFoilMiddle, SplineFoilWingInside, [MiddleProfile], Items=8, Surface=True, Solid=True, Distribution='elliptic', DistributionReverse=True, LoftMaxDegree=3)
+    MiddlePart1 = CurvedShapes.makeCurvedSegment(SplineFoilMiddle, SplineFoilWingInside, [MiddleProfile], Items=Items, Surface=True, Solid=True, Distribution='elliptic', DistributionReverse=True, LoftMaxDegree=3)
     MiddlePart1.Label = "MiddlePart1"
-    MiddlePart1.ViewObject.Visibility = False
+    MiddlePart1.Visibility = False
 
     MainWing = doc.addObject('Part::Loft', 'MainWing') 
     MainWing.Sections = [SplineFoilWingInside ,SplineFoilWingOutside]
@@ -94,10 +93,10 @@ def draw_S800():
     WingToWinglet.Label = "WingToWinglet"
 
     WingletProfile = makeWingletProfile(doc)
-    WingletProfile.ViewObject.Visibility = False
+    WingletProfile.Visibility = False
 
     doc.recompute()
-    Winglet = CurvedShapes.makeCurvedArray(SplineFoilWingletBottom, [WingletProfile], Items=8, OffsetStart=0.01, OffsetEnd=0.01, Surface=True, Solid=True)
+    Winglet = CurvedShapes.makeCurvedArray(SplineFoilWingletBottom, [WingletProfile], Items=Items, OffsetStart=0.01, OffsetEnd=0.01, Surface=True, Solid=True)
     Winglet.Label = "Winget"
 
     doc.recompute()
@@ -121,7 +120,7 @@ def draw_S800():
     sketchCutout.addConstraint(Sketcher.Constraint('DistanceX', 2, 2, 2, 1, midWidth/2))
     sketchCutout.addConstraint(Sketcher.Constraint('DistanceY', 2, 2, midLength))
     sketchCutout.addConstraint(Sketcher.Constraint('DistanceY', 3, 1, 3, 2, midLength))
-    sketchCutout.ViewObject.Visibility = False
+    sketchCutout.Visibility = False
     sketchCutout.Placement.Base.x = -1
 
     cutout = doc.addObject('Part::Extrusion', 'cutout')
@@ -131,7 +130,7 @@ def draw_S800():
     cutout.LengthRev = 100.0
     cutout.Solid = True
     cutout.Symmetric = True
-    cutout.ViewObject.Visibility = False
+    cutout.Visibility = False
 
     MiddlePart = doc.addObject('Part::Cut', 'MiddlePart')
     MiddlePart.Base = MiddlePart1
@@ -140,7 +139,7 @@ def draw_S800():
     cutpathPoints = [Vector(midWidth/2 , midLength, -WingInside_height_bot)]
     cutpathPoints.append(Vector(wing_span/2, midLength + sweep_offset - WingInside_length + WingOutside_length, -WingOutside_height_bot))
     cutpath = Draft.makeWire(cutpathPoints)
-    cutpath.ViewObject.Visibility = False
+    cutpath.Visibility = False
     cutExtrude = doc.addObject('Part::Extrusion', 'cutExtrude')
     cutExtrude.Base = cutpath
     cutExtrude.DirMode = "Normal"
@@ -160,9 +159,9 @@ def draw_S800():
     WingSlice.Mode = 'Split'
     WingSlice.Proxy.execute(WingSlice)
     WingSlice.purgeTouched()
-    WingSlice.ViewObject.Visibility = False
-    for obj in WingSlice.ViewObject.Proxy.claimChildren():
-        obj.ViewObject.hide()
+    WingSlice.Visibility = False
+    for obj in WingSlice.OutList:
+        obj.Visibility = False
 
     WingAndElevon = CompoundTools.Explode.explodeCompound(WingSlice)
     Wing1 = WingAndElevon[0].Group[1]
@@ -178,7 +177,7 @@ def draw_S800():
     FullWing.Source = HalfWing
 
     ElevonRight1 = Draft.clone(ElevonLeft)
-    ElevonRight1.ViewObject.Visibility = False
+    ElevonRight1.Visibility = False
 
     ElevonRight = doc.addObject('Part::Mirroring', 'ElevonRight')
     ElevonRight.Normal = Vector (1.0, 0.0, 0.0)
@@ -190,9 +189,10 @@ def draw_S800():
     Draft.rotate([ElevonLeft], ElevonLeftAngle, center, axis=axis, copy=False)
     Draft.rotate([ElevonRight1], ElevonRightAngle, center, axis=axis, copy=False)
     
-    FreeCADGui.activeDocument().activeView().viewIsometric()
-    FreeCADGui.SendMsgToActiveView("ViewFit")
-    return
+    if FreeCAD.GuiUp:
+        FreeCADGui.activeDocument().activeView().viewIsometric()
+        FreeCADGui.SendMsgToActiveView("ViewFit")
+    return doc
 
 
 def makeSplineFoilSketch(sketch, length, height_top, height_bottom, back_width = 0):
@@ -292,7 +292,7 @@ def createSketch_MiddleProfile(doc):
     MiddleProfile.addConstraint(Sketcher.Constraint('DistanceX', 10, 1, 10, 2, 24.0))
     MiddleProfile.addConstraint(Sketcher.Constraint('Coincident', 13, 1, 12, 2))
     MiddleProfile.Placement = Placement(Vector(0.0, 0.0, 0.0), Rotation (0.7071067811865475, -0.0, -0.0, 0.7071067811865476))
-    MiddleProfile.ViewObject.Visibility = False
+    MiddleProfile.Visibility = False
     return MiddleProfile
 
 
@@ -334,18 +334,20 @@ def makeWingletProfile(doc):
     return WingletProfile
 
 
-class FlyingWingS800():
-    def Activated(self):
-        import FlyingWingS800
-        draw_S800()
+if FreeCAD.GuiUp:
+    class FlyingWingS800():
+        def Activated(self):
+            import FlyingWingS800
+            draw_S800()
 
 
-    def GetResources(self):
-        import CurvedShapes
-        import os
-        return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "FlyingWingS800.svg"),
-                'MenuText': QT_TRANSLATE_NOOP("FlyingWingS800", "S800"),
-                'ToolTip' : QT_TRANSLATE_NOOP("FlyingWingS800", "A cheap flying wing")}
+        def GetResources(self):
+            import CurvedShapes
+            import os
+            return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "FlyingWingS800.svg"),
+                    'MenuText': QT_TRANSLATE_NOOP("FlyingWingS800", "S800"),
+                    'ToolTip' : QT_TRANSLATE_NOOP("FlyingWingS800", "A cheap flying wing")}
 
 
-FreeCADGui.addCommand('FlyingWingS800', FlyingWingS800())
+    if 'FlyingWingS800' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('FlyingWingS800', FlyingWingS800())
@@ -1,6 +1,7 @@
 from FreeCAD import Vector, Rotation
 import FreeCAD
-import FreeCADGui
+if FreeCAD.GuiUp:
+    import FreeCADGui
 import Part
 import Draft
 import CurvedShapes
@@ -10,17 +11,17 @@ from PySide.QtCore import QT_TRANSLATE_NOOP
 epsilon = CurvedShapes.epsilon
 translate = FreeCAD.Qt.translate
 
-def draw_HortenHIX():
+def draw_HortenHIX(scaleFactor = 1, twist = 3, ItemsFactor = 1, DocumentName = "Horten_HIX"):
+    """Draws the Horten H IX into a new document and returns the document. The parameters allow variants for design studies."""
     length = 500
-    scaleFactor = 1
-    twist = 3 
+    Items = max(2, round(32 * ItemsFactor))
 
-    if FreeCAD.ActiveDocument is not None and FreeCAD.ActiveDocument.Name == "Horten_HIX":
+    if FreeCAD.ActiveDocument is not None and FreeCAD.ActiveDocument.Name == DocumentName:
         FreeCAD.closeDocument(FreeCAD.ActiveDocument.Name)
         FreeCAD.setActiveDocument("")
         FreeCAD.ActiveDocument=None
 
-    doc = FreeCAD.newDocument('Horten_HIX')
+    doc = FreeCAD.newDocument(DocumentName)
 
     WingTop_parts = []
     line = Draft.makeWire([Vector(0.0, 73.39, 0.0) * scaleFactor, Vector(72.64, 27.65, 0.0) * scaleFactor])
@@ -56,8 +57,9 @@ def draw_HortenHIX():
     WingTop.Links = WingTop_parts
     WingTop.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     WingTop.Placement.Rotation = Rotation (0.0, 0.0, 0.0, 1.0)
-    WingTop.ViewObject.LineColor = (1.0 ,0.0 ,0.0 ,0.0)
-    WingTop.ViewObject.LineColorArray = [(1.0 ,0.0 ,0.0 ,0.0)]
+    if FreeCAD.GuiUp:
+        WingTop.ViewObject.LineColor = (1.0 ,0.0 ,0.0 ,0.0)
+        WingTop.ViewObject.LineColorArray = [(1.0 ,0.0 ,0.0 ,0.0)]
 
     WingFront_parts = []
     line = Draft.makeWire([Vector(0.0, -4.31, 0.0) * scaleFactor, Vector(77.02, 2.59, 0.0) * scaleFactor])
@@ -83,8 +85,9 @@ def draw_HortenHIX():
     WingFront.Links = WingFront_parts
     WingFront.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     WingFront.Placement.Rotation = Rotation (0.7071067811865475, -0.0, -0.0, 0.7071067811865476)
-    WingFront.ViewObject.LineColor = (1.0 ,0.0 ,0.5 ,0.0)
-    WingFront.ViewObject.LineColorArray = [(1.0 ,0.0 ,0.5 ,0.0)]
+    if FreeCAD.GuiUp:
+        WingFront.ViewObject.LineColor = (1.0 ,0.0 ,0.5 ,0.0)
+        WingFront.ViewObject.LineColorArray = [(1.0 ,0.0 ,0.5 ,0.0)]
 
     WingProfile_parts = []
     poles = []
@@ -109,8 +112,9 @@ def draw_HortenHIX():
     WingProfile.Links = WingProfile_parts
     WingProfile.Placement.Base = Vector(5.0, 73.0, 0.0) * scaleFactor
     WingProfile.Placement.Rotation = Rotation (0.5, -0.5, -0.5, 0.5)
-    WingProfile.ViewObject.LineColor = (1.0 ,0.33 ,0.0 ,0.0)
-    WingProfile.ViewObject.LineColorArray = [(1.0 ,0.33 ,0.0 ,0.0)]
+    if FreeCAD.GuiUp:
+        WingProfile.ViewObject.LineColor = (1.0 ,0.33 ,0.0 ,0.0)
+        WingProfile.ViewObject.LineColorArray = [(1.0 ,0.33 ,0.0 ,0.0)]
     # Profiles ^^^
 
     doc.recompute()
@@ -138,18 +142,18 @@ def draw_HortenHIX():
     WingTopLeft = doc.addObject('Part::Mirroring', 'WingTopLeft')
     WingTopLeft.Normal = Vector(1.0, 0.0, 0.0)
     WingTopLeft.Source = WingTop
-    WingTopLeft.ViewObject.hide()
+    WingTopLeft.Visibility = False
 
     WingFrontLeft = doc.addObject('Part::Mirroring', 'WingFrontLeft')
     WingFrontLeft.Normal = Vector(1.0, 0.0, 0.0)
     WingFrontLeft.Source = WingFront
-    WingFrontLeft.ViewObject.hide()
+    WingFrontLeft.Visibility = False
     doc.recompute()
 
     WingSurface = CurvedShapes.makeCurvedArray(Base=WingProfile, 
                                              Hullcurves=[WingTopLeft, WingFrontLeft], 
                                              Axis=Vector(-1,0,0), 
-                                             Items=32, 
+                                             Items=Items, 
                                              OffsetStart=0, 
                                              OffsetEnd=0,
                                              Twist=-twist,
@@ -185,8 +189,10 @@ def draw_HortenHIX():
     WingCutBack.Label = "WingCutBack"
 
     doc.recompute()
-    FreeCADGui.activeDocument().activeView().viewIsometric()
-    FreeCADGui.SendMsgToActiveView("ViewFit")
+    if FreeCAD.GuiUp:
+        FreeCADGui.activeDocument().activeView().viewIsometric()
+        FreeCADGui.SendMsgToActiveView("ViewFit")
+    return doc
 
 
 def drawCockpit(doc, scaleFactor, Wing):
@@ -207,7 +213,7 @@ def drawCockpit(doc, scaleFactor, Wing):
     CockpitFront.Links = CockpitFront_parts
     CockpitFront.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     CockpitFront.Placement.Rotation = Rotation (-0.7071067811865475, 0.0, 0.0, -0.7071067811865475)
-    CockpitFront.ViewObject.Visibility = False
+    CockpitFront.Visibility = False
 
     CockpitTop_parts = []
     poles = []
@@ -232,7 +238,7 @@ def drawCockpit(doc, scaleFactor, Wing):
     CockpitTopLeft = doc.addObject('Part::Mirroring', 'CockpitTopLeft')
     CockpitTopLeft.Normal = Vector(1.0, 0.0, 0.0)
     CockpitTopLeft.Source = CockpitTop
-    CockpitTopLeft.ViewObject.hide()
+    CockpitTopLeft.Visibility = False
 
     CockpitSide_parts = []
     poles = []
@@ -251,7 +257,7 @@ def drawCockpit(doc, scaleFactor, Wing):
     CockpitSide.Links = CockpitSide_parts
     CockpitSide.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     CockpitSide.Placement.Rotation = Rotation (0.5, 0.5, 0.5, 0.5)
-    CockpitSide.ViewObject.Visibility = False
+    CockpitSide.Visibility = False
 
     doc.recompute() 
 
@@ -261,16 +267,18 @@ def drawCockpit(doc, scaleFactor, Wing):
     CockpitFrontLeft = doc.addObject('Part::Mirroring', 'CockpitFrontLeft')
     CockpitFrontLeft.Normal = Vector(1.0, 0.0, 0.0)
     CockpitFrontLeft.Source = CockpitFront
-    CockpitFrontLeft.ViewObject.hide()
+    CockpitFrontLeft.Visibility = False
     doc.recompute()
 
     CockpitLeft = CurvedShapes.makeCurvedPathArray(CockpitFrontLeft, CockpitSide, [CockpitSide, CockpitTopLeft], Items=24, OffsetStart=0, OffsetEnd=0, Surface=True, Solid=False)
     CockpitLeft.Label = "CockpitLeft"
-    CockpitLeft.ViewObject.Transparency = 50
+    if FreeCAD.GuiUp:
+        CockpitLeft.ViewObject.Transparency = 50
 
     Cockpit = doc.addObject('Part::Compound', 'Cockpit')
     Cockpit.Links = [CockpitRight, CockpitLeft]
-    Cockpit.ViewObject.Transparency = 50
+    if FreeCAD.GuiUp:
+        Cockpit.ViewObject.Transparency = 50
 
     return Cockpit
 
@@ -327,9 +335,9 @@ def makeTurbine(doc, scaleFactor = 1):
     Turbine.Objects = Turbine_parts 
     Turbine.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     Turbine.Placement.Rotation = Rotation (0.0, 0.0, 0.0, 1.0)
-    for obj in Turbine.ViewObject.Proxy.claimChildren():
-        obj.ViewObject.hide()
-    Turbine.ViewObject.hide()
+    for obj in Turbine.OutList:
+        obj.Visibility = False
+    Turbine.Visibility = False
     Revolve = doc.addObject('Part::Revolution', 'Turbine')
     Revolve.Axis = Vector(0.0, 1.0, 0.0)
     Revolve.Base = Vector(-6.0, 0.0, 0.0) * scaleFactor
@@ -353,9 +361,9 @@ def makeTurbineCut(doc, scaleFactor = 1):
     TurbineCut.Objects = Turbinecut_parts
     TurbineCut.Placement.Base = Vector(0.0, 0.0, 0.0) * scaleFactor
     TurbineCut.Placement.Rotation = Rotation (0.0, 0.0, 0.0, 1.0)
-    for obj in TurbineCut.ViewObject.Proxy.claimChildren():
-        obj.ViewObject.hide()
-    TurbineCut.ViewObject.hide()
+    for obj in TurbineCut.OutList:
+        obj.Visibility = False
+    TurbineCut.Visibility = False
     Revolve = doc.addObject('Part::Revolution', 'TurbineCut')
     Revolve.Axis = Vector(0.0, 1.0, 0.0)
     Revolve.Base = Vector(-6.0, 0.0, 0.0) * scaleFactor
@@ -365,18 +373,20 @@ def makeTurbineCut(doc, scaleFactor = 1):
     return Revolve
 
 
-class Horten_HIX():
-    def Activated(self):
-        import Horten_HIX
-        draw_HortenHIX()
+if FreeCAD.GuiUp:
+    class Horten_HIX():
+        def Activated(self):
+            import Horten_HIX
+            draw_HortenHIX()
 
 
-    def GetResources(self):
-        import CurvedShapes
-        import os
-        return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "Horten_HIX.svg"),
-                'MenuText': QT_TRANSLATE_NOOP("Horten_HIX", "Horten H IX"),
-                'ToolTip' : QT_TRANSLATE_NOOP("Horten_HIX", "Example shape of a stealth fighter from WW2")}
+        def GetResources(self):
+            import CurvedShapes
+            import os
+            return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "Horten_HIX.svg"),
+                    'MenuText': QT_TRANSLATE_NOOP("Horten_HIX", "Horten H IX"),
+                    'ToolTip' : QT_TRANSLATE_NOOP("Horten_HIX", "Example shape of a stealth fighter from WW2")}
 
 
-FreeCADGui.addCommand('Horten_HIX', Horten_HIX())
+    if 'Horten_HIX' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('Horten_HIX', Horten_HIX())
@@ -7,37 +7,31 @@ __url__ = ['http://www.freecadweb.org']
 class CurvedShapesWB (Workbench):
     def __init__(self):
         import os
-        import CurvedShapes
+        import LazyCommands
         
         translate = FreeCAD.Qt.translate
-        translations_path = os.path.join(os.path.join(CurvedShapes.get_module_path(), 'Resources', "translations"))
+        translations_path = os.path.join(os.path.join(LazyCommands.modulePath, 'Resources', "translations"))
         FreeCADGui.addLanguagePath(translations_path)
         FreeCADGui.updateLocale()
 
         self.__class__.MenuText = 'Curved Shapes'
         self.__class__.ToolTip = translate("Workbench", 'Creates 3D designs from 2D curves')
-        self.__class__.Icon = os.path.join(CurvedShapes.get_module_path(), 'Resources', 'icons', 'curvedArray.svg')
+        self.__class__.Icon = os.path.join(LazyCommands.iconPath, 'curvedArray.svg')
 
 
     def Initialize(self):
         'This function is executed when FreeCAD starts'
-        # import here all the needed files that create your FreeCAD commands
-        import CurvedShapes 
-        import CurvedSegment
-        import CurvedArray   
-        import CurvedPathArray   
-        import InterpolatedMiddle 
-        import Horten_HIX
-        import FlyingWingS800
-        import SurfaceCut
-        import NotchConnector
+        # the commands are registered as stubs, their modules are imported on the first activation
+        import LazyCommands
+        LazyCommands.register()
         from PySide.QtCore import QT_TRANSLATE_NOOP
 
         self.examples = ['Horten_HIX', 'FlyingWingS800'] # A list of command names created in the line above
-        self.list = ['CurvedArray', 'CurvedPathArray', 'CurvedSegment', 'CurvedPathSegment', 'InterpolatedMiddle', 'SurfaceCut', 'NotchConnector'] # A list of command names created in the line above
+        self.list = ['CurvedArray', 'CurvedPathArray', 'CurvedSegment', 'CurvedPathSegment', 'InterpolatedMiddle', 'SurfaceCut', 'SurfaceCutStack', 'NotchConnector'] # A list of command names created in the line above
         self.appendToolbar(QT_TRANSLATE_NOOP('Curved Shapes', 'Curved Shapes'), self.list) # creates a new toolbar with your commands
         self.appendMenu(QT_TRANSLATE_NOOP('Curved Shapes', 'Curved Shapes'), self.list) # creates a new menu 'Curved Functions'
         self.appendMenu('Curved Shapes', 'Separator') # creates a new menu separator
+        self.appendMenu(QT_TRANSLATE_NOOP('Curved Shapes', 'Curved Shapes'), ['RecomputeStats'])
         self.appendMenu(QT_TRANSLATE_NOOP('Curved Shapes', 'Examples'), self.examples) # creates a new menu
 
 
@@ -11,6 +11,8 @@ import FreeCAD
 from FreeCAD import Vector
 import Part
 import CurvedShapes
+import ShapeCache
+import RecomputeStats
 import CurvedSegment
 if FreeCAD.GuiUp:
     import FreeCADGui
@@ -47,19 +49,24 @@ class InterpolatedMiddle:
         fp.Proxy = self
 
 
+    @RecomputeStats.timedExecute
     def execute(self, fp):
         if not self.update:
             return 
 
-        if not fp.Shape1 or not hasattr(fp.Shape1, "Shape") or len(fp.Shape1.Shape.Edges) == 0:
+        if not fp.Shape1 or not hasattr(fp.Shape1, "Shape"):
             return
 
-        if not fp.Shape2 or not hasattr(fp.Shape2, "Shape") or len(fp.Shape2.Shape.Edges) == 0:
+        if not fp.Shape2 or not hasattr(fp.Shape2, "Shape"):
             return
 
         if fp.InterpolationPoints <= 1:
             return
 
+        fp = CurvedShapes.FeatureSnapshot(fp, ["Shape1", "Shape2"])
+        if len(fp.Shape1.Edges) == 0 or len(fp.Shape2.Edges) == 0:
+            return
+
         try:
             self.update = False
             if fp.NormalShape1 == Vector(0,0,0):        
@@ -68,7 +75,13 @@ class InterpolatedMiddle:
             if fp.NormalShape2 == Vector(0,0,0):    
                 fp.NormalShape2 = CurvedShapes.getNormal(fp.Shape2)
 
-            self.makeRibs(fp)
+            key = ShapeCache.featureKey(fp)
+            shape = ShapeCache.lookup(key)
+            if shape is not None:
+                fp.Shape = shape
+            else:
+                self.makeRibs(fp)
+                ShapeCache.store(key, fp.Shape)
             self.update = True
         except Exception as ex:
             self.update = True
@@ -83,25 +96,11 @@ class InterpolatedMiddle:
 
 
     def makeRibs(self, fp):
-        interpolate = False
-        if len(fp.Shape1.Shape.Edges) != len(fp.Shape2.Shape.Edges):
-            interpolate = True
-        else:
-            for e in range(0, len(fp.Shape1.Shape.Edges)):
-                edge1 = fp.Shape1.Shape.Edges[e]
-                edge2 = fp.Shape2.Shape.Edges[e]
-                curve1 = edge1.Curve.toBSpline()
-                curve2 = edge2.Curve.toBSpline()
-                poles1 = curve1.getPoles()
-                poles2 = curve2.getPoles()
-                if len(poles1) != len(poles2):
-                    interpolate = True
-                    break
-
-        if interpolate:
+        curvePairs = CurvedShapes.compatibleProfiles(fp.Shape1, fp.Shape2, fp.TwistReverse)
+        if curvePairs is None:
             ribs = CurvedSegment.makeRibsInterpolate(fp, 1, True, False)
         else:
-            ribs = CurvedSegment.makeRibsSameShape(fp, 1, True, False)
+            ribs = CurvedSegment.makeRibsSameShape(fp, 1, True, False, curvePairs)
 
         if (fp.makeSurface or fp.makeSolid) and len(ribs) == 1:
             rib1 = [fp.Shape1.Shape, ribs[0]]
@@ -135,7 +134,7 @@ class InterpolatedMiddle:
         else:
             shape = Part.makeCompound(ribs)
 
-        if shape:
+        if shape is not None:
             fp.Shape = shape
 
 
@@ -222,4 +221,5 @@ if FreeCAD.GuiUp:
                     'ToolTip' : QT_TRANSLATE_NOOP("InterpolatedMiddle", __doc__ )}
 
 
-    FreeCADGui.addCommand('InterpolatedMiddle', InterpolatedMiddleCommand())
+    if 'InterpolatedMiddle' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('InterpolatedMiddle', InterpolatedMiddleCommand())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+__title__ = "LazyCommands"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = "Registers the commands of the workbench without importing their modules"
+
+import os
+import importlib
+import FreeCAD
+import FreeCADGui
+from PySide.QtCore import QT_TRANSLATE_NOOP
+
+# CurvedShapes is not imported for its module path, it loads numpy, Part and the caches
+modulePath = os.path.dirname(os.path.abspath(__file__))
+iconPath = os.path.join(modulePath, "Resources", "icons")
+
+
+class LazyCommand:
+    """
+    Stands in for a command of the workbench. The module of the command is imported on the first activation,
+    so starting the workbench does not load the features, the examples and their dependencies.
+    """
+    def __init__(self, module, command, icon, menuText, toolTip, needsDocument=False):
+        self.module = module
+        self.command = command
+        self.icon = icon
+        self.menuText = menuText
+        self.toolTip = toolTip
+        self.needsDocument = needsDocument
+
+
+    def Activated(self):
+        module = importlib.import_module(self.module)
+        getattr(module, self.command)().Activated()
+
+
+    def IsActive(self):
+        if self.needsDocument:
+            return FreeCAD.ActiveDocument is not None
+        return True
+
+
+    def GetResources(self):
+        return {'Pixmap'  : os.path.join(iconPath, self.icon),
+                'Accel' : "",
+                'MenuText': self.menuText,
+                'ToolTip' : self.toolTip}
+
+
+# command name: (module, command class, icon, menu text, tooltip, needs a document)
+commands = {
+    'CurvedArray': ('CurvedArray', 'CurvedArrayCommand', 'curvedArray.svg',
+                    QT_TRANSLATE_NOOP("CurvedArray", "Curved Array"),
+                    QT_TRANSLATE_NOOP("CurvedArray", "Creates an array and resizes the items in the bounds of curves in the XY, XZ or YZ plane."), False),
+    'CurvedPathArray': ('CurvedPathArray', 'CurvedPathArrayCommand', 'CurvedPathArray.svg',
+                    QT_TRANSLATE_NOOP("CurvedPathArray", "Curved Path Array"),
+                    QT_TRANSLATE_NOOP("CurvedPathArray", "Creates an array, sweeps the elements around a path curve, and resizes the items in the bounds of optional hullcurves."), False),
+    'CurvedSegment': ('CurvedSegment', 'CurvedSegmentCommand', 'curvedSegment.svg',
+                    QT_TRANSLATE_NOOP("CurvedSegment", "Curved Segment"),
+                    QT_TRANSLATE_NOOP("CurvedSegment", "Interpolates a 3D shape between two 2D curves and optional hullcurves"), False),
+    'CurvedPathSegment': ('CurvedSegment', 'CurvedPathSegmentCommand', 'CurvedPathSegment.svg',
+                    QT_TRANSLATE_NOOP("CurvedPathSegment", "Curved Path Segment"),
+                    QT_TRANSLATE_NOOP("CurvedPathSegment", "Interpolates a 3D shape between two 2D curves and optional hullcurves along a path"), False),
+    'InterpolatedMiddle': ('InterpolatedMiddle', 'InterpolatedMiddleCommand', 'CornerShape.svg',
+                    QT_TRANSLATE_NOOP("InterpolatedMiddle", "Interpolated Middle"),
+                    QT_TRANSLATE_NOOP("InterpolatedMiddle", "Interpolates a 2D shape into the middle between two 2D curves"), False),
+    'SurfaceCut': ('SurfaceCut', 'SurfaceCutCommand', 'surfaceCut.svg',
+                    QT_TRANSLATE_NOOP("SurfaceCut", "Surface Cut"),
+                    QT_TRANSLATE_NOOP("SurfaceCut", "Creates a wire by cutting through surfaces"), True),
+    'SurfaceCutStack': ('SurfaceCutStack', 'SurfaceCutStackCommand', 'SurfaceCutStack.svg',
+                    QT_TRANSLATE_NOOP("SurfaceCutStack", "Surface Cut Stack"),
+                    QT_TRANSLATE_NOOP("SurfaceCutStack", "Creates the wires of many parallel cuts through surfaces, e.g. for ribs"), True),
+    'NotchConnector': ('NotchConnector', 'NotchConnectorCommand', 'NotchConnector.svg',
+                    QT_TRANSLATE_NOOP("NotchConnector", "Notch Connector"),
+                    QT_TRANSLATE_NOOP("NotchConnector", "Cuts notches into an object to make it connectable other objects with a notch"), True),
+    'Horten_HIX': ('Horten_HIX', 'Horten_HIX', 'Horten_HIX.svg',
+                    QT_TRANSLATE_NOOP("Horten_HIX", "Horten H IX"),
+                    QT_TRANSLATE_NOOP("Horten_HIX", "Example shape of a stealth fighter from WW2"), False),
+    'FlyingWingS800': ('FlyingWingS800', 'FlyingWingS800', 'FlyingWingS800.svg',
+                    QT_TRANSLATE_NOOP("FlyingWingS800", "S800"),
+                    QT_TRANSLATE_NOOP("FlyingWingS800", "A cheap flying wing"), False),
+    'RecomputeStats': ('RecomputeStats', 'RecomputeStatsCommand', 'RecomputeStats.svg',
+                    QT_TRANSLATE_NOOP("RecomputeStats", "Recompute Stats"),
+                    QT_TRANSLATE_NOOP("RecomputeStats", "Lists the slowest Curved Shapes features and the time of their phases"), False),
+}
+
+
+def register():
+    """Adds a LazyCommand for each command that is not registered yet, e.g. by a module loaded with a document"""
+    registered = FreeCADGui.listCommands()
+    for name, args in commands.items():
+        if name not in registered:
+            FreeCADGui.addCommand(name, LazyCommand(*args))
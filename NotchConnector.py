@@ -11,6 +11,7 @@ import FreeCAD
 from FreeCAD import Vector
 import Part
 import CurvedShapes
+import RecomputeStats
 if FreeCAD.GuiUp:
     import FreeCADGui
 
@@ -24,23 +25,28 @@ class NotchConnector:
                  Tools,
                  CutDirection=Vector(0,0,0),
                  CutDepth=50.0,
-                 ShiftLength=0):
+                 ShiftLength=0,
+                 Parallel=False):
         fp.addProperty("App::PropertyLink", "Base", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Object to cut")).Base = Base
         fp.addProperty("App::PropertyLinkList", "Tools", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Object to cut")).Tools = Tools
         fp.addProperty("App::PropertyVector", "CutDirection", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "The direction of the cut")).CutDirection = CutDirection
         fp.addProperty("App::PropertyFloat", "CutDepth", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Length of the cut in percent")).CutDepth = CutDepth
         fp.addProperty("App::PropertyFloat", "ShiftLength", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Shift the tools, then cut. Overrides CutDepth if not zero")).ShiftLength = ShiftLength
+        fp.addProperty("App::PropertyBool", "Parallel", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Cut the notches of the base shapes in parallel worker processes")).Parallel = Parallel
         fp.Proxy = self
 
 
     def onChanged(self, fp, prop):
         proplist = ["Base", "Tools", "CutDirection", "ShiftLength"]
+        if not hasattr(fp, 'Parallel'):
+            CurvedShapes.addObjectProperty(fp, "App::PropertyBool", "Parallel", "NotchConnector", QT_TRANSLATE_NOOP("App::Property", "Cut the notches of the base shapes in parallel worker processes"), init_val=False) # backwards compatibility - this upgrades older documents
 
         if prop == "CutDepth" and fp.CutDirection != Vector(0.0,0.0,0.0):
             cdep = 100 - abs(fp.CutDepth)
             fp.CutDirection = fp.CutDirection.normalize() * cdep / 50
 
 
+    @RecomputeStats.timedExecute
     def execute(self, fp):
         if not fp.Base or not fp.Tools:
             return 
@@ -78,7 +84,8 @@ class NotchConnector:
 
         fp.Proxy = self
         self.cutNotches(fp)
-        fp.Base.ViewObject.hide()
+        if getattr(fp.Base, "ViewObject", None):
+            fp.Base.ViewObject.hide()
 
 
     def extractCompounds(self, obj):
@@ -103,9 +110,17 @@ class NotchConnector:
         return shapes
 
 
+    @RecomputeStats.timedPhase("notches")
     def cutNotches(self, fp):
-        shapes = []
-        halfsize = fp.CutDirection / 2
+        tools = self.extractShapes(fp.Tools)
+        tboxes = None
+        if fp.ShiftLength == 0:
+            # only tools whose bounding box overlaps a base shape can cut a notch into it
+            tboxes = [tool.optimalBoundingBox() for tool in tools]
+            toolIndex = CurvedShapes.BoundBoxIndex([tool.BoundBox for tool in tools])
+
+        # each base shape with the indices of the tools that may cut it
+        parts = []
         for obj in self.extractCompounds([fp.Base]):
             useSubPart = obj.TypeId == 'Part::Extrusion' and len(obj.Base.Shape.Faces) > 0
             if useSubPart:
@@ -114,57 +129,130 @@ class NotchConnector:
                 bShapes = obj
 
             for bShape in self.extractShapes([bShapes]):    
-                cutcubes = []
-
-                for tool in self.extractShapes(fp.Tools):  
-                    if fp.ShiftLength == 0:  
-                        tbox = tool.optimalBoundingBox()
-                        common = tool.common(bShape)
-                        cbox = common.BoundBox
-                        if cbox.XLength + cbox.YLength + cbox.ZLength > epsilon:
-                            cbox = common.optimalBoundingBox()
-                            vSize = Vector(cbox.XLength, cbox.YLength, cbox.ZLength)
-                            vPlace = Vector(cbox.XMin, cbox.YMin, cbox.ZMin)
-                            if vSize.x < epsilon or vSize.x > tbox.XLength: 
-                                vSize.x = tbox.XLength
-                                vPlace.x = tbox.XMin
-                            if vSize.y < epsilon or vSize.y > tbox.YLength: 
-                                vSize.y = tbox.YLength
-                                vPlace.y = tbox.YMin
-                            if vSize.z < epsilon or vSize.z > tbox.ZLength: 
-                                vSize.z = tbox.ZLength   
-                                vPlace.z = tbox.ZMin
-
-                            cutcube = Part.makeBox(vSize.x, vSize.y, vSize.z)
-                            cutcube.Placement.Base = vPlace           
-                            cutcube.Placement.Base.x += cbox.XLength * halfsize.x
-                            cutcube.Placement.Base.y += cbox.YLength * halfsize.y
-                            cutcube.Placement.Base.z += cbox.ZLength * halfsize.z
-                            cutcubes.append(cutcube)
-                    else:
-                        cutcube = tool.copy()
-                        cutcube.Placement.Base = tool.Placement.Base + fp.CutDirection * fp.ShiftLength                        
-                        cutcubes.append(cutcube)                            
-
-                if len(cutcubes) > 0:
-                    try:
-                        cutted = bShape.cut(cutcubes)
-                    except Exception as ex:
-                        cutted = bShape
-
+                if fp.ShiftLength == 0:
+                    candidates = toolIndex.overlapping(bShape.BoundBox)
                 else:
-                    cutted = bShape
+                    candidates = list(range(len(tools)))
 
-                if useSubPart:
-                    cutted.Placement.Base -= obj.Dir * float(obj.LengthRev)               
-                    ext = cutted.extrude(obj.Dir * float(obj.LengthFwd + obj.LengthRev))
-                    shapes.append(ext)
-                else:
-                    shapes.append(cutted)
+                parts.append((obj, useSubPart, bShape, candidates))
+
+        cutShapes = None
+        if getattr(fp, "Parallel", False) and len(parts) > 1:
+            cutShapes = notchShapesParallel(parts, tools, tboxes, fp.CutDirection, fp.ShiftLength)
+
+        if cutShapes is None:
+            cutShapes = []
+            for obj, useSubPart, bShape, candidates in parts:
+                cutShapes.append(notchShape(bShape, [tools[t] for t in candidates], [tboxes[t] for t in candidates] if tboxes else None, fp.CutDirection, fp.ShiftLength))
+
+        shapes = []
+        for (obj, useSubPart, bShape, candidates), cutted in zip(parts, cutShapes):
+            if useSubPart:
+                cutted.Placement.Base -= obj.Dir * float(obj.LengthRev)               
+                ext = cutted.extrude(obj.Dir * float(obj.LengthFwd + obj.LengthRev))
+                shapes.append(ext)
+            else:
+                shapes.append(cutted)
 
         fp.Shape = Part.makeCompound(shapes)
 
 
+def notchShape(bShape, tools, tboxes, cutDirection, shiftLength):
+    """
+    Cuts the notches of tools into bShape and returns the result.
+    tboxes are the optimal bounding boxes of the tools, they are only used if shiftLength is 0.
+    """
+    halfsize = cutDirection / 2
+    cutcubes = []
+    for n, tool in enumerate(tools):  
+        if shiftLength == 0:  
+            tbox = tboxes[n]
+            common = tool.common(bShape)
+            RecomputeStats.count("boolean")
+            cbox = common.BoundBox
+            if cbox.XLength + cbox.YLength + cbox.ZLength > epsilon:
+                cbox = common.optimalBoundingBox()
+                vSize = Vector(cbox.XLength, cbox.YLength, cbox.ZLength)
+                vPlace = Vector(cbox.XMin, cbox.YMin, cbox.ZMin)
+                if vSize.x < epsilon or vSize.x > tbox.XLength: 
+                    vSize.x = tbox.XLength
+                    vPlace.x = tbox.XMin
+                if vSize.y < epsilon or vSize.y > tbox.YLength: 
+                    vSize.y = tbox.YLength
+                    vPlace.y = tbox.YMin
+                if vSize.z < epsilon or vSize.z > tbox.ZLength: 
+                    vSize.z = tbox.ZLength   
+                    vPlace.z = tbox.ZMin
+
+                cutcube = Part.makeBox(vSize.x, vSize.y, vSize.z)
+                cutcube.Placement.Base = vPlace           
+                cutcube.Placement.Base.x += cbox.XLength * halfsize.x
+                cutcube.Placement.Base.y += cbox.YLength * halfsize.y
+                cutcube.Placement.Base.z += cbox.ZLength * halfsize.z
+                cutcubes.append(cutcube)
+        else:
+            cutcube = tool.copy()
+            cutcube.Placement.Base = tool.Placement.Base + cutDirection * shiftLength                        
+            cutcubes.append(cutcube)                            
+
+    if len(cutcubes) > 0:
+        try:
+            cutted = bShape.cut(cutcubes)
+            RecomputeStats.count("boolean")
+        except Exception as ex:
+            cutted = bShape
+
+    else:
+        cutted = bShape
+
+    return cutted
+
+
+def _boxTuple(bbox):
+    return (bbox.XMin, bbox.YMin, bbox.ZMin, bbox.XMax, bbox.YMax, bbox.ZMax)
+
+
+def _notchWorker(baseBrep, toolBreps, tboxes, cutDirection, shiftLength):
+    tools = [CurvedShapes.shapeFromBrep(brep) for brep in toolBreps]
+    if tboxes is not None:
+        tboxes = [FreeCAD.BoundBox(*box) for box in tboxes]
+    cutted = notchShape(CurvedShapes.shapeFromBrep(baseBrep), tools, tboxes, Vector(*cutDirection), shiftLength)
+    return cutted.exportBrepToString()
+
+
+def notchShapesParallel(parts, tools, tboxes, cutDirection, shiftLength):
+    """
+    Cuts the notches of each base shape in parts in worker processes and returns the results in the order of parts.
+    Returns None if no process pool is available or a worker crashed.
+    Raises RuntimeError if a base shape is not cut within workerTimeout() seconds.
+    """
+    from concurrent.futures import TimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+    pool = CurvedShapes.processPool(CurvedShapes.recomputeWorkers(len(parts)))
+    if pool is None:
+        return None
+
+    # every tool is converted only once, even if it cuts many base shapes
+    toolBreps = [tool.exportBrepToString() for tool in tools]
+    boxes = [_boxTuple(box) for box in tboxes] if tboxes else None
+    direction = (cutDirection.x, cutDirection.y, cutDirection.z)
+    tasks = []
+    for obj, useSubPart, bShape, candidates in parts:
+        tasks.append((bShape.exportBrepToString(), [toolBreps[t] for t in candidates],
+                      [boxes[t] for t in candidates] if boxes else None, direction, shiftLength))
+
+    try:
+        breps = CurvedShapes.poolMap(pool, _notchWorker, tasks)
+    except BrokenProcessPool:
+        FreeCAD.Console.PrintWarning(translate("Curved Shapes", "Parallel notch cutting failed, cutting in a single process") + "\n")
+        return None
+    except TimeoutError as ex:
+        # cutting the hung shape again in this process would hang FreeCAD
+        raise RuntimeError(translate("Curved Shapes", "Cutting the notches of {} did not finish within {} s").format(parts[ex.task][0].Label, CurvedShapes.workerTimeout()))
+
+    return [CurvedShapes.shapeFromBrep(brep) for brep in breps]
+
+
 #background compatibility
 NotchConnectorWorker = NotchConnector
 
@@ -256,4 +344,5 @@ if FreeCAD.GuiUp:
                     'ToolTip' : QT_TRANSLATE_NOOP("NotchConnector", __doc__)}
 
 
-    FreeCADGui.addCommand('NotchConnector', NotchConnectorCommand())
+    if 'NotchConnector' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('NotchConnector', NotchConnectorCommand())
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+__title__ = "RecomputeStats"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = "Measures the time of the phases of a feature recompute, e.g. ribs, boundboxes, loft and solid."
+
+import os
+import json
+import time
+import functools
+import FreeCAD
+from PySide.QtCore import QT_TRANSLATE_NOOP
+
+translate = FreeCAD.Qt.translate
+
+
+def parameters():
+    return FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/CurvedShapes")
+
+
+# nothing is measured unless enabled is set by the RecomputeStats parameter or the benchmark
+enabled = parameters().GetBool("RecomputeStats", False)
+
+# read only, transient, output: the stats are not saved and do not touch the feature
+propertyAttributes = 1 | 2 | 8
+
+# the stats of the measured recomputes while collecting is set, oldest first.
+# Only a collector like the benchmark sets collecting, the GUI reads the stats from the features.
+records = []
+collecting = False
+
+_features = []
+_phases = []
+
+
+class FeatureStats:
+    def __init__(self, name, typeName):
+        self.name = name
+        self.type = typeName
+        self.total = 0.0
+        self.phases = {}
+        self.counters = {}
+
+
+    def asDict(self):
+        return {"name": self.name, "type": self.type, "total": self.total, "phases": dict(self.phases), "counters": dict(self.counters)}
+
+
+    def asMap(self):
+        """Returns the stats as strings for a PropertyMap"""
+        m = {"total": "%.4f" % self.total}
+        for name, seconds in self.phases.items():
+            m["phase." + name] = "%.4f" % seconds
+        for name, n in self.counters.items():
+            m["count." + name] = str(n)
+        return m
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_noTimer = _NoTimer()
+
+
+class _FeatureTimer:
+    def __init__(self, fp):
+        self.fp = fp
+        self.stats = FeatureStats(getattr(fp, "Label", getattr(fp, "Name", "")), type(getattr(fp, "Proxy", None)).__name__)
+
+    def __enter__(self):
+        _features.append(self.stats)
+        self.start = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *args):
+        self.stats.total = time.perf_counter() - self.start
+        _features.pop()
+        if collecting:
+            records.append(self.stats)
+        publish(self.fp, self.stats)
+        return False
+
+
+class _PhaseTimer:
+    """Adds the time of the phase to the running feature. The time of nested phases is not counted twice."""
+    def __init__(self, name):
+        self.name = name
+        self.nested = 0.0
+
+    def __enter__(self):
+        _phases.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        _phases.pop()
+        if _phases:
+            _phases[-1].nested += elapsed
+        phases = _features[-1].phases
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed - self.nested
+        return False
+
+
+def feature(fp):
+    """Context that measures the recompute of fp"""
+    if not enabled:
+        return _noTimer
+    return _FeatureTimer(fp)
+
+
+def phase(name):
+    """Context that measures a phase of the running recompute"""
+    if not enabled or not _features:
+        return _noTimer
+    return _PhaseTimer(name)
+
+
+def count(name, n=1):
+    """Counts n OCCT calls like lofts or booleans for the running recompute"""
+    if enabled and _features:
+        counters = _features[-1].counters
+        counters[name] = counters.get(name, 0) + n
+
+
+def publish(fp, stats):
+    """Writes the stats to the LastRecomputeStats property of fp and to the log file set by the RecomputeStatsLog parameter"""
+    try:
+        if not hasattr(fp, "LastRecomputeStats"):
+            fp.addProperty("App::PropertyMap", "LastRecomputeStats", "Stats", QT_TRANSLATE_NOOP("App::Property", "Time in seconds of the last recompute and its phases, and the number of OCCT calls"), propertyAttributes)
+        fp.LastRecomputeStats = stats.asMap()
+    except Exception as ex:
+        FreeCAD.Console.PrintWarning("Curved Shapes: stats of %s not stored: %s\n" % (stats.name, ex))
+
+    path = parameters().GetString("RecomputeStatsLog", "")
+    if path:
+        entry = stats.asDict()
+        entry["time"] = time.time()
+        entry["document"] = fp.Document.Name if hasattr(fp, "Document") else None
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as ex:
+            FreeCAD.Console.PrintWarning("Curved Shapes: writing %s failed: %s\n" % (path, ex))
+
+
+def timedExecute(execute):
+    """Decorator for the execute method of a proxy"""
+    @functools.wraps(execute)
+    def wrapper(self, fp):
+        if not enabled:
+            return execute(self, fp)
+        with feature(fp):
+            return execute(self, fp)
+    return wrapper
+
+
+def timedPhase(name):
+    """Decorator for a function that is one phase of a recompute"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled or not _features:
+                return func(*args, **kwargs)
+            with _PhaseTimer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset():
+    del records[:]
+
+
+def setEnabled(on):
+    """Switches the measurement on or off and stores this in the RecomputeStats parameter"""
+    global enabled
+    enabled = on
+    parameters().SetBool("RecomputeStats", on)
+
+
+def slowestFeatures(doc, limit=None):
+    """Returns (total, feature, stats map) for the features in doc with LastRecomputeStats, slowest first"""
+    found = []
+    for obj in doc.Objects:
+        stats = getattr(obj, "LastRecomputeStats", None)
+        if stats and "total" in stats:
+            found.append((float(stats["total"]), obj, stats))
+
+    found.sort(key=lambda f: f[0], reverse=True)
+    return found[:limit] if limit else found
+
+
+if FreeCAD.GuiUp:
+    import FreeCADGui
+    from PySide import QtGui
+
+    class RecomputeStatsDialog(QtGui.QDialog):
+        """Lists the slowest features of the active document with the times of their phases"""
+        def __init__(self):
+            super().__init__(FreeCADGui.getMainWindow())
+            self.setWindowTitle(translate("Curved Shapes", "Recompute Stats"))
+            layout = QtGui.QVBoxLayout(self)
+
+            self.enable = QtGui.QCheckBox(translate("Curved Shapes", "Measure recomputes"))
+            self.enable.setChecked(enabled)
+            self.enable.toggled.connect(setEnabled)
+            layout.addWidget(self.enable)
+
+            self.table = QtGui.QTableWidget(0, 5)
+            self.table.setHorizontalHeaderLabels([translate("Curved Shapes", "Feature"), translate("Curved Shapes", "Type"),
+                                                  translate("Curved Shapes", "Total [s]"), translate("Curved Shapes", "Phases [s]"),
+                                                  translate("Curved Shapes", "OCCT calls")])
+            self.table.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
+            self.table.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+            self.table.itemDoubleClicked.connect(self.select)
+            layout.addWidget(self.table)
+
+            buttons = QtGui.QHBoxLayout()
+            refresh = QtGui.QPushButton(translate("Curved Shapes", "Refresh"))
+            refresh.clicked.connect(self.refresh)
+            buttons.addWidget(refresh)
+            close = QtGui.QPushButton(translate("Curved Shapes", "Close"))
+            close.clicked.connect(self.close)
+            buttons.addWidget(close)
+            layout.addLayout(buttons)
+
+            self.resize(800, 400)
+            self.refresh()
+
+
+        def refresh(self):
+            self.features = []
+            if FreeCAD.ActiveDocument:
+                self.features = slowestFeatures(FreeCAD.ActiveDocument)
+
+            self.table.setRowCount(len(self.features))
+            for row, (total, obj, stats) in enumerate(self.features):
+                phases = sorted(((k[6:], float(v)) for k, v in stats.items() if k.startswith("phase.")), key=lambda p: p[1], reverse=True)
+                counters = sorted((k[6:], v) for k, v in stats.items() if k.startswith("count."))
+                cells = [obj.Label, type(getattr(obj, "Proxy", None)).__name__, "%.3f" % total,
+                         ", ".join("%s %.3f" % p for p in phases), ", ".join("%s %s" % c for c in counters)]
+                for col, text in enumerate(cells):
+                    self.table.setItem(row, col, QtGui.QTableWidgetItem(text))
+
+            self.table.resizeColumnsToContents()
+
+
+        def select(self, item):
+            obj = self.features[item.row()][1]
+            FreeCADGui.Selection.clearSelection()
+            FreeCADGui.Selection.addSelection(obj)
+
+
+    dialog = None
+
+    class RecomputeStatsCommand():
+        def Activated(self):
+            global dialog
+            dialog = RecomputeStatsDialog()
+            dialog.show()
+
+
+        def IsActive(self):
+            return True
+
+
+        def GetResources(self):
+            import CurvedShapes
+            return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "RecomputeStats.svg"),
+                    'MenuText': QT_TRANSLATE_NOOP("RecomputeStats", "Recompute Stats"),
+                    'ToolTip' : QT_TRANSLATE_NOOP("RecomputeStats", "Lists the slowest Curved Shapes features and the time of their phases")}
+
+
+    if 'RecomputeStats' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('RecomputeStats', RecomputeStatsCommand())
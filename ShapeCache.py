@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+__title__ = "ShapeCache"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = "Content addressed cache for the shapes computed by the Curved Shapes features."
+
+import os
+import re
+import hashlib
+import tempfile
+from collections import OrderedDict
+import FreeCAD
+import Part
+import RecomputeStats
+
+# increment if the features compute different shapes from the same input, this invalidates the disk cache
+# 2: arc length path placement, least squares rib fit, compatible profile edges
+version = 2
+
+# properties that do not change the computed shape
+ignoredProperties = ["Label", "Label2", "Placement", "Shape", "Proxy", "Visibility", "ExpressionEngine", "Content", "ParallelLoft", "Parallel", "LastRecomputeStats"]
+
+# properties that are computed from the other properties if AdaptiveTolerance is set
+adaptiveProperties = ["Positions", "Items"]
+
+# properties that only change the surface made from the ribs, not the ribs
+surfaceProperties = ["Surface", "Solid", "makeSurface", "makeSolid", "LoftMaxDegree", "MaxLoftSize", "SurfaceMode"]
+
+
+def parameters():
+    return FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/CurvedShapes")
+
+
+def workbenchVersion():
+    """Returns the version in package.xml, so installing another release of the workbench invalidates the disk cache as well"""
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "package.xml"), "r") as f:
+            found = re.search(r"<version>\s*([^<\s]+)\s*</version>", f.read())
+        return found.group(1) if found else ""
+    except OSError:
+        return ""
+
+_keyVersion = "%d:%s" % (version, workbenchVersion())
+
+
+def fingerprint(shape):
+    """Returns a hash of the geometry and location of shape"""
+    return hashlib.sha1(shape.exportBrepToString().encode()).hexdigest()
+
+
+def linkFingerprint(obj):
+    if obj is None or not hasattr(obj, 'Shape'):
+        return None
+    # a CurvedShapes.ShapeSnapshot computes the fingerprint of its shape only once
+    if callable(getattr(type(obj), "fingerprint", None)):
+        return obj.fingerprint()
+    return fingerprint(obj.Shape)
+
+
+def subKey(key, *args):
+    """Returns the key of an intermediate result derived from the entry key with the parameters args"""
+    return hashlib.sha1(("%s;%r" % (key, args)).encode()).hexdigest()
+
+
+def featureKey(fp, exclude=[], memoryOnly=False):
+    """
+    Returns the cache key of a feature: the type of its proxy, the fingerprints of all linked shapes
+    and the values of all other properties except the ones in ignoredProperties and exclude.
+    fp may be a FeatureSnapshot, so the linked shapes are read only once.
+    Returns None if nothing would be stored with the key, so a disabled cache does not export and hash the shapes.
+    memoryOnly is set for the keys of intermediate results, these are not stored in the cache directory.
+    """
+    if not enabled() and (memoryOnly or cacheDirectory() is None):
+        return None
+
+    h = hashlib.sha1(("%s:%s;" % (type(fp.Proxy).__name__, _keyVersion)).encode())
+    for name in sorted(fp.PropertiesList):
+        if name in ignoredProperties or name in exclude:
+            continue
+
+        val = getattr(fp, name)
+        if fp.getTypeIdOfProperty(name).startswith("App::PropertyLink"):
+            if isinstance(val, list):
+                val = [linkFingerprint(o) for o in val]
+            else:
+                val = linkFingerprint(val)
+
+        h.update(("%s=%r;" % (name, val)).encode())
+
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Least recently used cache of BREP strings that evicts entries if the stored size exceeds maxBytes"""
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+
+    def get(self, key):
+        brep = self.entries.get(key)
+        if brep is not None:
+            self.entries.move_to_end(key)
+        return brep
+
+
+    def put(self, key, brep):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+
+        if len(brep) > self.maxBytes:
+            return
+
+        self.entries[key] = brep
+        self.size += len(brep)
+        while self.size > self.maxBytes:
+            k, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+_cache = None
+
+def cache():
+    """Returns the shared cache. Its size is set in MB by the CacheSize parameter, 0 (default) disables caching."""
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(parameters().GetInt("CacheSize", 0) * 1024 * 1024)
+    return _cache
+
+
+# set by the benchmark, so every recompute computes its shape
+suspended = False
+
+def enabled():
+    return not suspended and cache().maxBytes > 0
+
+
+def cacheDirectory():
+    """Returns the directory of the persistent cache set by the CacheDirectory parameter, or None"""
+    path = parameters().GetString("CacheDirectory", "")
+    if not path or suspended:
+        return None
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as ex:
+        FreeCAD.Console.PrintWarning("Curved Shapes: cache directory %s not available: %s\n" % (path, ex))
+        return None
+
+    return path
+
+
+def _removeFile(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def loadFile(path):
+    """Returns the shape stored in path, or None. Unreadable or invalid files are removed."""
+    shape = Part.Shape()
+    try:
+        with open(path, "r") as f:
+            brep = f.read()
+        shape.importBrepFromString(brep)
+    except Exception:
+        _removeFile(path)
+        return None, None
+
+    if shape.isNull() or not shape.isValid():
+        _removeFile(path)
+        return None, None
+
+    os.utime(path)
+    return shape, brep
+
+
+def saveFile(directory, key, brep):
+    """Writes brep atomically, so other processes never read a partial file"""
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(brep)
+        os.replace(tmp, os.path.join(directory, key + ".brep"))
+    except OSError as ex:
+        _removeFile(tmp)
+        FreeCAD.Console.PrintWarning("Curved Shapes: writing cache file failed: %s\n" % ex)
+        return
+
+    pruneDirectory(directory, parameters().GetInt("CacheDirectorySize", 1024) * 1024 * 1024)
+
+
+def pruneDirectory(directory, maxBytes):
+    """Removes the least recently used files until the directory holds at most maxBytes"""
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".brep"):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+
+    size = sum(f[1] for f in files)
+    files.sort()
+    for mtime, fsize, path in files:
+        if size <= maxBytes:
+            break
+        _removeFile(path)
+        size -= fsize
+
+
+@RecomputeStats.timedPhase("cache")
+def lookup(key):
+    """Returns the cached shape for key from memory or from the cache directory, or None"""
+    if key is None:
+        return None
+
+    if enabled():
+        brep = cache().get(key)
+        if brep is not None:
+            shape = Part.Shape()
+            shape.importBrepFromString(brep)
+            return shape
+
+    directory = cacheDirectory()
+    if directory:
+        path = os.path.join(directory, key + ".brep")
+        if os.path.exists(path):
+            shape, brep = loadFile(path)
+            if shape is not None:
+                if enabled():
+                    cache().put(key, brep)
+                return shape
+
+    return None
+
+
+@RecomputeStats.timedPhase("cache")
+def store(key, shape):
+    if key is None or shape.isNull():
+        return
+
+    directory = cacheDirectory()
+    if not enabled() and not directory:
+        return
+
+    brep = shape.exportBrepToString()
+    if enabled():
+        cache().put(key, brep)
+    if directory:
+        saveFile(directory, key, brep)
+
+
+def lookupShapes(key):
+    """Returns the list of shapes stored with storeShapes, or None"""
+    if key is None or not enabled():
+        return None
+
+    brep = cache().get("shapes:" + key)
+    if brep is None:
+        return None
+
+    compound = Part.Shape()
+    compound.importBrepFromString(brep)
+    return compound.childShapes()
+
+
+def storeShapes(key, shapes):
+    """Stores a list of intermediate shapes like ribs or loft faces. These are only kept in memory."""
+    if key is None or not enabled():
+        return
+
+    cache().put("shapes:" + key, Part.makeCompound(shapes).exportBrepToString())
@@ -7,10 +7,14 @@ __license__ = "LGPL 2.1"
 __doc__ = QT_TRANSLATE_NOOP("SurfaceCut", "Creates a wire by cutting through surfaces")
 
 import os
+import math
+import bisect
+from collections import OrderedDict
 import FreeCAD
 from FreeCAD import Vector
 import Part
 import CurvedShapes
+import RecomputeStats
 if FreeCAD.GuiUp:
     import FreeCADGui
 
@@ -28,6 +32,7 @@ class SurfaceCut:
         obj.Proxy = self  
 
 
+    @RecomputeStats.timedExecute
     def execute(self, fp):
         self.cutSurfaces(fp)
         self.makeFace(fp)
@@ -50,9 +55,28 @@ class SurfaceCut:
                 fp.Shape = Part.Compound(fp.Shape.Wires)
 
 
+    @RecomputeStats.timedPhase("slice")
     def cutSurfaces(self, fp):
-        edges=list()
+        normal = self.unitNormal(fp)
+        off = self.planeOffset(fp)
+        shapes = []
+        for obj in fp.Surfaces:
+            shapes += FaceIndex(obj.Shape, normal).cutShapes(off)
+
+        edges = self.sliceEdges(fp, shapes, normal, off)
+        fp.Shape = self.makeWires(edges)
+
+
+    def unitNormal(self, fp):
+        """
+        Returns Normal with length 1. slice() places the plane at off / |Normal|,
+        so the offsets, the face extents and the slices must all use the unit normal.
+        """
+        return Vector(fp.Normal).normalize()
 
+
+    def planeOffset(self, fp):
+        """Returns the distance of the cut plane from the origin along Normal"""
         if len(fp.Surfaces) == 1:
             vOffset = fp.Surfaces[0].Placement.Base
         else:
@@ -67,20 +91,27 @@ class SurfaceCut:
 
         vOffset += fp.Position
         origin = Vector(0,0,0)
-        off = origin.distanceToPlane(vOffset, fp.Normal) * -1
+        return origin.distanceToPlane(vOffset, fp.Normal) * -1
 
-        for obj in fp.Surfaces:
-            for wire in obj.Shape.slice(fp.Normal, off):
+
+    def sliceEdges(self, fp, shapes, normal, off):
+        """Returns the edges of the cuts through shapes with the plane at off along the unit vector normal"""
+        edges=list()
+        for shape in shapes:
+            RecomputeStats.count("slice")
+            for wire in shape.slice(normal, off):
                 edges += wire.Edges
 
         if fp.Simplify > 0:    
             edges = self.removeEdgeComplexity(fp, edges) 
 
-        edges = self.removeDoubles(edges)
+        return self.removeDoubles(edges)
+
 
+    def makeWires(self, edges):
         comp = Part.Compound(edges)
         comp.connectEdgesToWires(False, 1e-7)  
-        fp.Shape = comp
+        return comp
 
 
     def removeEdgeComplexity(self, fp, edges):
@@ -99,23 +130,42 @@ class SurfaceCut:
 
 
     def removeDoubles(self, edges):
-        newedges = []
-        for e in edges:
-            found = False
-            for e2 in edges:
-                if e != e2 and self.isSameEdge(e, e2):
-                    found = True
-                    break
+        """Removes all edges that occur more than once, e.g. where the cut plane runs along the seam of two faces"""
+        # every edge is filed under the grid cells of both its end points. A double has an end point within
+        # epsilon of the first point of the edge, so it is filed in the same or a neighbouring cell.
+        cells = {}
+        for n, e in enumerate(edges):
+            for v in (e.valueAt(e.FirstParameter), e.valueAt(e.LastParameter)):
+                cells.setdefault(self.gridCell(v), set()).add(n)
+
+        polygons = {}
+        def polygon(n):
+            if n not in polygons:
+                polygons[n] = edges[n].discretize(Deflection = 1.0)
+            return polygons[n]
 
-            if not found:
+        newedges = []
+        for n, e in enumerate(edges):
+            cx, cy, cz = self.gridCell(e.valueAt(e.FirstParameter))
+            candidates = set()
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for dz in (-1, 0, 1):
+                        candidates |= cells.get((cx + dx, cy + dy, cz + dz), set())
+
+            candidates.discard(n)
+            if not any(self.isSamePolygon(polygon(n), polygon(m)) for m in candidates):
                 newedges.append(e)
 
         return newedges
 
 
-    def isSameEdge(self, e1, e2):
-        pol1 = e1.discretize(Deflection = 1.0)
-        pol2 = e2.discretize(Deflection = 1.0)
+    def gridCell(self, v, size=epsilon):
+        """Returns the cell of a grid with cells of size epsilon that contains the point v"""
+        return (math.floor(v.x / size), math.floor(v.y / size), math.floor(v.z / size))
+
+
+    def isSamePolygon(self, pol1, pol2):
         if len(pol1) != len(pol2): return False
 
         equal = True
@@ -132,6 +182,64 @@ class SurfaceCut:
         return True
 
 
+class FaceIndex:
+    """
+    The faces of a shape sorted by their extent along the normal of the cut planes.
+    Finds the faces a cut plane can cross, so only these are sliced.
+    """
+    def __init__(self, shape, normal):
+        self.shape = shape
+        self.low, self.high = CurvedShapes.boundBoxExtent(shape.BoundBox, normal)
+
+        # faces of the same shell are sliced together, so an edge shared by two faces is not cut twice
+        entries = []
+        inShells = set()
+        for n, shell in enumerate(shape.Shells):
+            for face in shell.Faces:
+                inShells.add(face.hashCode())
+                entries.append(CurvedShapes.boundBoxExtent(face.BoundBox, normal) + (n, face))
+
+        for face in shape.Faces:
+            if face.hashCode() not in inShells:
+                entries.append(CurvedShapes.boundBoxExtent(face.BoundBox, normal) + (None, face))
+
+        entries.sort(key=lambda e: e[0])
+        self.entries = entries
+        self.lows = [e[0] for e in entries]
+
+
+    def crossing(self, off):
+        """Returns the entries (low, high, shell, face) of the faces the plane at off can cross"""
+        end = bisect.bisect_right(self.lows, off + epsilon)
+        return [e for e in self.entries[:end] if e[1] >= off - epsilon]
+
+
+    def cutShapes(self, off):
+        """Returns the shapes to slice with the plane at off: the shape if the plane crosses all faces, else the crossed faces"""
+        if off < self.low - epsilon or off > self.high + epsilon:
+            return []
+
+        hits = self.crossing(off)
+        if len(hits) == len(self.entries) or len(self.entries) == 0:
+            return [self.shape]
+
+        shells = OrderedDict()
+        shapes = []
+        for low, high, shell, face in hits:
+            if shell is None:
+                shapes.append(face)
+            else:
+                shells.setdefault(shell, []).append(face)
+
+        for faces in shells.values():
+            try:
+                shapes.append(Part.Shell(faces))
+            except Exception as ex:
+                shapes += faces
+
+        return shapes
+
+
 #background compatibility
 SurfaceCutWorker = SurfaceCut
 
@@ -193,4 +301,5 @@ if FreeCAD.GuiUp:
                     'ToolTip' : QT_TRANSLATE_NOOP("SurfaceCut", __doc__)}
 
 
-    FreeCADGui.addCommand('SurfaceCut', SurfaceCutCommand())
+    if 'SurfaceCut' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('SurfaceCut', SurfaceCutCommand())
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from PySide.QtCore import QT_TRANSLATE_NOOP
+
+__title__ = "SurfaceCutStack"
+__author__ = "Christian Bergmann"
+__license__ = "LGPL 2.1"
+__doc__ = QT_TRANSLATE_NOOP("SurfaceCutStack", "Creates the wires of many parallel cuts through surfaces, e.g. for ribs")
+
+import os
+import FreeCAD
+from FreeCAD import Vector
+import Part
+import CurvedShapes
+import RecomputeStats
+import SurfaceCut
+if FreeCAD.GuiUp:
+    import FreeCADGui
+
+epsilon = CurvedShapes.epsilon
+translate = FreeCAD.Qt.translate
+
+class SurfaceCutStack(SurfaceCut.SurfaceCut):
+    def __init__(self, obj, Surfaces=[], Normal=Vector(0, 0, 1), Position=Vector(0,0,0), Offsets=[], Count=0, Face=False, Simplify=0):
+        obj.addProperty("App::PropertyFloatList", "Offsets", "SurfaceCutStack", QT_TRANSLATE_NOOP("App::Property", "Distances of the cut planes along Normal from the plane at Position")).Offsets = Offsets
+        obj.addProperty("App::PropertyInteger", "Count", "SurfaceCutStack", QT_TRANSLATE_NOOP("App::Property", "If Offsets is empty, number of cuts evenly spaced over the Surfaces along Normal")).Count = Count
+        super().__init__(obj, Surfaces, Normal, Position, Face, Simplify)
+
+
+    def onChanged(self, fp, prop):
+        pass
+
+
+    def stationOffsets(self, fp, extents):
+        """
+        Returns the distances of the cut planes from the origin along the unit normal.
+        extents are the (min, max) of the surfaces along the unit normal.
+        """
+        if len(fp.Offsets) > 0:
+            off = self.planeOffset(fp)
+            return [off + o for o in fp.Offsets]
+
+        if fp.Count < 1 or not extents:
+            return []
+
+        low = min(e[0] for e in extents)
+        high = max(e[1] for e in extents)
+        return [low + (high - low) * (n + 1) / (fp.Count + 1) for n in range(fp.Count)]
+
+
+    @RecomputeStats.timedPhase("slice")
+    def cutSurfaces(self, fp):
+        # the stations, the face extents and the slices are measured along the same unit normal
+        normal = self.unitNormal(fp)
+
+        # the faces of each surface are sorted once for all stations
+        indexes = [SurfaceCut.FaceIndex(obj.Shape, normal) for obj in fp.Surfaces]
+        extents = [(index.low, index.high) for index in indexes]
+
+        stations = []
+        for off in self.stationOffsets(fp, extents):
+            # only cut the faces the plane can cross
+            hits = []
+            for index in indexes:
+                hits += index.cutShapes(off)
+            station = self.makeWires(self.sliceEdges(fp, hits, normal, off))
+            if fp.Face and len(station.Wires) > 0:
+                station = Part.makeFace(station.Wires, "Part::FaceMakerSimple")
+            stations.append(station)
+
+        fp.Shape = Part.makeCompound(stations)
+
+
+    def makeFace(self, fp):
+        # the faces are made per station in cutSurfaces
+        pass
+
+
+class SurfaceCutStackViewProvider(SurfaceCut.SurfaceCutViewProvider):
+    def getIcon(self):
+        return (os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "SurfaceCutStack.svg"))
+
+
+if FreeCAD.GuiUp:
+
+    class SurfaceCutStackCommand():
+        def Activated(self):
+            FreeCADGui.doCommand("import CurvedShapes")
+
+            selection = FreeCADGui.Selection.getSelectionEx()
+            FreeCADGui.doCommand("curves = []")
+            for sel in selection:
+                FreeCADGui.doCommand("curves.append(FreeCAD.ActiveDocument.getObject('%s'))"%(sel.ObjectName))
+
+            FreeCADGui.doCommand("CurvedShapes.makeSurfaceCutStack(curves, Normal = FreeCAD.Vector(1, 0, 0), Position=FreeCAD.Vector(0,0,0), Count=10, Face=False, Simplify=0)")
+            FreeCAD.ActiveDocument.recompute()
+
+
+        def IsActive(self):
+            if FreeCAD.ActiveDocument:
+                return(True)
+            else:
+                return(False)
+
+
+        def GetResources(self):
+            return {'Pixmap'  : os.path.join(CurvedShapes.get_module_path(), "Resources", "icons", "SurfaceCutStack.svg"),
+                    'Accel' : "", # a default shortcut (optional)
+                    'MenuText': QT_TRANSLATE_NOOP("SurfaceCutStack", "Surface Cut Stack"),
+                    'ToolTip' : QT_TRANSLATE_NOOP("SurfaceCutStack", __doc__)}
+
+
+    if 'SurfaceCutStack' not in FreeCADGui.listCommands():
+        FreeCADGui.addCommand('SurfaceCutStack', SurfaceCutStackCommand())